@@ -0,0 +1,109 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+"""
+Times the NES preprocessor lexer and compiler lexer on
+examples/6502/nes/visuals.s.  The file is read once and lexed over and over
+by each lexer, and the best of the runs is reported in tokens per second
+along with the size of the lexer's master regex.
+
+usage: benchmarks/directives.py [repeat]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.symboltable import SymbolTable
+from hlakit.common.types import Types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def lex_all(lexer, data):
+    lexer.input(data)
+    count = 0
+    while True:
+        t = lexer.token()
+        if t is None:
+            break
+        count += 1
+    return count
+
+def regex_size(lexer):
+    return sum([ len(r.pattern) for (r, f) in lexer.lexre ])
+
+def best_of(repeat, func, *args):
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return (result, best)
+
+def main():
+    repeat = 50
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+
+    fpath = os.path.join(ROOT, 'examples', '6502', 'nes', 'visuals.s')
+    fin = open(fpath)
+    data = fin.read()
+    fin.close()
+
+    table_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, 'w')
+        Types.reset()
+        SymbolTable().reset_state()
+        session = Session()
+        session.parse_args(['--platform=NES', '--table-dir=%s' % table_dir])
+        session.initialize_target()
+        lexers = [ ('pp_lexer', session.pp_lexer()),
+                   ('lexer', session.lexer()) ]
+        sys.stdout = stdout
+
+        for (name, lexer) in lexers:
+            (count, best) = best_of(repeat, lex_all, lexer, data)
+            print "%-9s  regex: %5d chars  tokens: %6d  best: %7.2f ms  %10.0f tokens/s" % \
+                  (name, regex_size(lexer), count, best * 1000.0, count / best)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
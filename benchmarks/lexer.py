@@ -0,0 +1,123 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+"""
+Times the compiler lexer on include/cpu/6502/std_math.h.  The header is
+read once and lexed over and over by the 6502 target's lexer, and the best
+of the runs is reported in tokens per second.  The identifier rule is also
+timed on its own, classifying every word of the header.
+
+usage: benchmarks/lexer.py [repeat]
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ply.lex as lex
+from hlakit.common.session import Session
+from hlakit.common.symboltable import SymbolTable
+from hlakit.common.types import Types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def lex_all(lexer, data):
+    lexer.input(data)
+    count = 0
+    ids = 0
+    while True:
+        t = lexer.token()
+        if t is None:
+            break
+        count += 1
+        if t.type == 'ID':
+            ids += 1
+    return (count, ids)
+
+def classify(module, words):
+    t = lex.LexToken()
+    t_ID = module.t_ID
+    for w in words:
+        t.value = w
+        t_ID(t)
+    return len(words)
+
+def best_of(repeat, func, *args):
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return (result, best)
+
+def main():
+    repeat = 20
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+
+    fpath = os.path.join(ROOT, 'include', 'cpu', '6502', 'std_math.h')
+    fin = open(fpath)
+    data = fin.read()
+    fin.close()
+
+    table_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, 'w')
+        Types.reset()
+        SymbolTable().reset_state()
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir])
+        session.initialize_target()
+        lexer = session.lexer()
+        module = session.get_target().lexer()
+        sys.stdout = stdout
+
+        ((count, ids), best) = best_of(repeat, lex_all, lexer, data)
+        print "%-12s  tokens: %6d  identifiers: %6d  best: %7.2f ms  %10.0f tokens/s" % \
+              (os.path.basename(fpath), count, ids, best * 1000.0, count / best)
+
+        words = re.findall(r'[a-zA-Z_][\w]*', data)
+        (count, best) = best_of(repeat, classify, module, words)
+        print "%-12s  words:  %6d                      best: %7.2f ms  %10.0f words/s" % \
+              ('t_ID', count, best * 1000.0, count / best)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+"""
+Times the preprocessor macro expansion.  The std_*.h headers are timed as
+they are, then generated sources that call the same operations as object,
+function-like and variadic macros.  The macro table hits and misses are
+summed over the three timed runs.
+
+usage: benchmarks/macros.py [calls]
+"""
+
+import os
+import sys
+import glob
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.symboltable import SymbolTable
+from hlakit.common.compilecontext import CompileContext
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+DEFINES = [ '#define _b_temp $10',
+            '#define CARRY $01',
+            '#define add(dest, value) lda dest clc adc value sta dest',
+            '#define add_16_8(dest, value) add(dest, value) lda dest+1 adc #0 sta dest+1',
+            '#define load(...) lda __VA_ARGS__' ]
+
+CALLS = { 'object':     'lda _b_temp and CARRY',
+          'function':   'add(var_%d, _b_temp)',
+          'nested':     'add_16_8(var_%d, CARRY)',
+          'variadic':   'load(var_%d, x)' }
+
+def generate(src_dir, kind, calls):
+    src = list(DEFINES)
+    for i in xrange(calls):
+        line = CALLS[kind]
+        if '%d' in line:
+            line = line % i
+        src.append(line)
+    fpath = os.path.join(src_dir, '%s.s' % kind)
+    fout = open(fpath, 'w')
+    fout.write('\n'.join(src) + '\n')
+    fout.close()
+    return fpath
+
+def time_file(table_dir, fpath):
+    # a fresh context per file so nothing is left over from the last one
+    with CompileContext():
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, '--pp-cache-size=0', fpath])
+        session.initialize_target()
+
+        best = None
+        count = 0
+        for i in xrange(3):
+            SymbolTable().reset_state()
+            start = time.time()
+            count = len(session.preprocess_file(fpath)[1])
+            elapsed = time.time() - start
+            if (best is None) or (elapsed < best):
+                best = elapsed
+        table = session.get_macro_table()
+        return (count, best, table.hits, table.misses)
+
+def main():
+    calls = 2000
+    if len(sys.argv) > 1:
+        calls = int(sys.argv[1])
+
+    table_dir = tempfile.mkdtemp()
+    src_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, 'w')
+        results = []
+        for fpath in sorted(glob.glob(os.path.join(ROOT, 'include', 'cpu', '6502', 'std_*.h'))):
+            results.append((os.path.basename(fpath),) + time_file(table_dir, fpath))
+        for kind in ('object', 'function', 'nested', 'variadic'):
+            fpath = generate(src_dir, kind, calls)
+            results.append(('%d %s' % (calls, kind),) + time_file(table_dir, fpath))
+        sys.stdout = stdout
+
+        for (name, count, elapsed, hits, misses) in results:
+            print "%-20s  tokens: %8d  time: %8.1f ms  %6.2f us/token  lookups hit: %6d  miss: %6d" % \
+                  (name, count, elapsed * 1000.0, (elapsed * 1000000.0) / max(count, 1), hits, misses)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+        shutil.rmtree(src_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
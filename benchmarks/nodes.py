@@ -0,0 +1,165 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+"""
+Compiles a generated source and compares the tuples the parser makes with
+the same tree as AST nodes.  It reports the bytes the containers of each
+tree take, strings and numbers shared by both aren't counted, and how long
+it takes to count the assembly statements by switching on the tuple tags
+against a Visitor.
+
+usage: benchmarks/nodes.py [functions]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.astnodes import Node, Visitor, from_tuple
+
+def generate(src_dir, functions):
+    lines = []
+    for i in xrange(functions):
+        lines.append('byte var_%d = %d' % (i, i % 256))
+        lines.append('function f_%d()\n{' % i)
+        lines.append('\tlda #lo(var_%d + 1)\n\tsta var_%d\n\tldx #$10' % (i, i))
+        lines.append('\tif (zero)\n\t{\n\t\tinx\n\t\tstx var_%d\n\t}\n\telse\n\t{\n\t\tdex\n\t}' % i)
+        lines.append('\twhile (not zero)\n\t{\n\t\tdey\n\t}\n}')
+    fpath = os.path.join(src_dir, 'nodes.s')
+    fout = open(fpath, 'w')
+    fout.write('\n'.join(lines) + '\n')
+    fout.close()
+    return fpath
+
+def footprint(tree):
+    # the tuples, lists and nodes of the tree, every object counted once
+    seen = set()
+    total = 0
+    stack = [ tree ]
+    while len(stack):
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        if isinstance(o, (tuple, list)):
+            stack.extend(o)
+        elif isinstance(o, Node):
+            stack.extend(o.values())
+        else:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+    return total
+
+def count_legacy(t):
+    # the way passes walk the tuples today
+    n = 0
+    if isinstance(t, list):
+        for i in t:
+            n += count_legacy(i)
+    elif isinstance(t, tuple) and len(t):
+        tag = t[0]
+        if tag == 'asm':
+            n += 1
+        elif tag == 'program':
+            n += count_legacy(t[1])
+        elif tag == 'function':
+            n += count_legacy(t[2])
+        elif tag == 'if':
+            n += count_legacy(t[2])
+            if len(t) > 3:
+                n += count_legacy(t[3])
+        elif (tag == 'while') or (tag == 'do_while'):
+            n += count_legacy(t[2])
+        elif tag == 'forever':
+            n += count_legacy(t[1])
+    return n
+
+class AsmCounter(Visitor):
+
+    def __init__(self):
+        super(AsmCounter, self).__init__()
+        self.count = 0
+
+    def visit_Asm(self, node):
+        self.count += 1
+
+    def visit_Variable(self, node):
+        pass
+
+def main():
+    functions = 500
+    if len(sys.argv) > 1:
+        functions = int(sys.argv[1])
+
+    table_dir = tempfile.mkdtemp()
+    src_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        fpath = generate(src_dir, functions)
+        sys.stdout = open(os.devnull, 'w')
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, fpath])
+        session.initialize_target()
+        tree = session.compile(session.preprocess())[0][3]
+        sys.stdout = stdout
+
+        start = time.time()
+        nodes = from_tuple(tree)
+        convert = time.time() - start
+
+        print "tuples: %8.1f KB  nodes: %8.1f KB  convert: %6.1f ms" % \
+              (footprint(tree) / 1024.0, footprint(nodes) / 1024.0, convert * 1000.0)
+
+        repeat = 20
+        start = time.time()
+        for i in xrange(repeat):
+            legacy = count_legacy(tree)
+        legacy_time = (time.time() - start) / repeat
+        start = time.time()
+        for i in xrange(repeat):
+            counter = AsmCounter()
+            counter.visit(nodes)
+        visitor_time = (time.time() - start) / repeat
+        assert legacy == counter.count
+        print "asm statements: %d  tag switch: %6.2f ms  visitor: %6.2f ms" % \
+              (legacy, legacy_time * 1000.0, visitor_time * 1000.0)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+        shutil.rmtree(src_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
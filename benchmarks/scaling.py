@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+"""
+Preprocesses and parses generated sources of doubling size and reports how
+the run time grows.  Linear rules should show a ratio close to 2.0 for each
+doubling, a quadratic rule shows a ratio closer to 4.0.
+
+usage: benchmarks/scaling.py [lines]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.compilecontext import CompileContext
+
+def generate(lines):
+    src = []
+    for i in xrange(lines):
+        src.append('byte var_%d = %d' % (i, i % 256))
+    return '\n'.join(src) + '\n'
+
+def time_run(table_dir, src_dir, lines):
+    fpath = os.path.join(src_dir, 'scaling_%d.s' % lines)
+    fout = open(fpath, 'w')
+    fout.write(generate(lines))
+    fout.close()
+
+    with CompileContext():
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, '--pp-cache-size=0', fpath])
+        session.initialize_target()
+
+        start = time.time()
+        pp = session.preprocess()
+        pp_time = time.time() - start
+
+        start = time.time()
+        session.compile(pp)
+        cc_time = time.time() - start
+
+        return (pp_time, cc_time)
+
+def main():
+    lines = 2000
+    if len(sys.argv) > 1:
+        lines = int(sys.argv[1])
+
+    table_dir = tempfile.mkdtemp()
+    src_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        # build the tables before timing anything
+        sys.stdout = open(os.devnull, 'w')
+        time_run(table_dir, src_dir, 10)
+        sys.stdout = stdout
+
+        last = None
+        for i in xrange(4):
+            sys.stdout = open(os.devnull, 'w')
+            (pp_time, cc_time) = time_run(table_dir, src_dir, lines)
+            sys.stdout = stdout
+
+            if last is None:
+                print "%8d lines  preprocess: %8.1f ms  compile: %8.1f ms" % \
+                      (lines, pp_time * 1000.0, cc_time * 1000.0)
+            else:
+                print "%8d lines  preprocess: %8.1f ms (x%.2f)  compile: %8.1f ms (x%.2f)" % \
+                      (lines, pp_time * 1000.0, pp_time / last[0], cc_time * 1000.0, cc_time / last[1])
+            last = (pp_time, cc_time)
+            lines *= 2
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+        shutil.rmtree(src_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+"""
+Defines a growing number of macros and types, like a large set of headers
+would, then times taking a snapshot of the symbols and types, restoring it
+and the first change after the restore.  The snapshot and restore should
+take the same time whatever the size.  The first change copies the one
+scope it changes, which is reported next to a deep copy of everything for
+comparison.
+
+usage: benchmarks/snapshots.py [symbols]
+"""
+
+import os
+import sys
+import copy
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.symboltable import SymbolTable
+from hlakit.common.types import Types
+from hlakit.common.ppmacro import PPMacro
+from hlakit.common.basetype import BaseType
+
+def timed(fn, repeat):
+    start = time.time()
+    for i in xrange(repeat):
+        fn()
+    return (time.time() - start) / repeat
+
+def main():
+    size = 1000
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+
+    repeat = 200
+    for n in (size, size * 10, size * 100):
+        with CompileContext():
+            st = SymbolTable()
+            types = Types()
+            for i in xrange(n):
+                st.new_symbol('MACRO_%d' % i, PPMacro('MACRO_%d' % i, [ str(i) ]))
+            for i in xrange(n / 10):
+                types.new_type('type_%d' % i, BaseType('type_%d' % i))
+            st.scope_push('f')
+
+            state = (st.snapshot(), types.snapshot())
+            def snapshot():
+                st.snapshot()
+                types.snapshot()
+            def restore():
+                st.restore(state[0])
+                types.restore(state[1])
+            def change():
+                st.restore(state[0])
+                types.restore(state[1])
+                st.new_symbol('LOCAL', 1)
+                st.new_symbol('GLOBAL', 1, SymbolTable.GLOBAL_NAMESPACE)
+                types.new_type('extra', BaseType('extra'))
+            def deep():
+                copy.deepcopy((st.get_scopes(), Types.get_table()))
+
+            # the first restore throws away the generations of every symbol
+            restore()
+
+            print "symbols: %7d  snapshot: %7.1f us  restore: %7.1f us  first change: %9.1f us  deepcopy: %9.1f us" % \
+                  (n, timed(snapshot, repeat) * 1e6, timed(restore, repeat) * 1e6,
+                   timed(change, repeat) * 1e6, timed(deep, max(1, repeat / n)) * 1e6)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+"""
+Preprocesses a generated source that includes the same header many times and
+reports the peak memory of building the whole token list against streaming
+the tokens.  Each run happens in its own process so the peaks don't mix.
+
+usage: benchmarks/streaming.py [includes]
+"""
+
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+
+def generate(src_dir, includes):
+    header = []
+    for i in xrange(200):
+        header.append('byte var_%d = %d' % (i, i % 256))
+    fout = open(os.path.join(src_dir, 'vars.h'), 'w')
+    fout.write('\n'.join(header) + '\n')
+    fout.close()
+
+    fpath = os.path.join(src_dir, 'streaming.s')
+    fout = open(fpath, 'w')
+    fout.write('#include "vars.h"\n' * includes)
+    fout.close()
+    return fpath
+
+def child(mode, table_dir, fpath):
+    session = Session()
+    session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, '--pp-cache-size=0', fpath])
+    session.initialize_target()
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    start = time.time()
+    count = 0
+    if mode == 'list':
+        count = len(session.preprocess_file(fpath)[1])
+    else:
+        for tok in session.preprocess_stream(fpath):
+            count += 1
+    elapsed = time.time() - start
+    sys.stdout = stdout
+
+    # ru_maxrss is in kilobytes on linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print '%d %f %d' % (count, elapsed, peak)
+
+def run(mode, table_dir, fpath):
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '--child', mode, table_dir, fpath])
+    (count, elapsed, peak) = out.split()
+    return (int(count), float(elapsed), int(peak))
+
+def main():
+    if (len(sys.argv) == 5) and (sys.argv[1] == '--child'):
+        child(sys.argv[2], sys.argv[3], sys.argv[4])
+        return 0
+
+    includes = 100
+    if len(sys.argv) > 1:
+        includes = int(sys.argv[1])
+
+    table_dir = tempfile.mkdtemp()
+    src_dir = tempfile.mkdtemp()
+    try:
+        # build the tables before measuring anything
+        run('list', table_dir, generate(src_dir, 1))
+
+        for i in xrange(3):
+            fpath = generate(src_dir, includes)
+            for mode in ('list', 'stream'):
+                (count, elapsed, peak) = run(mode, table_dir, fpath)
+                print "%6d includes %-6s  tokens: %8d  time: %8.1f ms  peak: %8.1f MB" % \
+                      (includes, mode, count, elapsed * 1000.0, peak / 1024.0)
+            includes *= 4
+    finally:
+        shutil.rmtree(table_dir, True)
+        shutil.rmtree(src_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
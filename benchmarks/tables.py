@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+"""
+Measures the time it takes to get the lexers and parsers for each target with
+an empty table cache (cold) and with the tables already cached (warm).
+
+usage: benchmarks/tables.py [iterations]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.tablecache import TableCache
+
+TARGETS = [ ['--cpu=6502'],
+            ['--platform=NES', '--cpu=2A03'] ]
+
+def build_all(session):
+    session.pp_lexer()
+    session.pp_parser()
+    session.lexer()
+    session.parser()
+
+def time_startup(args, table_dir, rebuild):
+    with CompileContext():
+        session = Session()
+        session.parse_args(args + ['--table-dir=%s' % table_dir])
+        session.initialize_target()
+        if rebuild:
+            shutil.rmtree(session.get_table_cache().get_dir(), True)
+        start = time.time()
+        build_all(session)
+        return time.time() - start
+
+def main():
+    iterations = 5
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+
+    # PLY reports grammar conflicts on stderr, keep the output readable
+    sys.stderr = open(os.devnull, 'w')
+
+    table_dir = tempfile.mkdtemp()
+    try:
+        for args in TARGETS:
+            cold = min([ time_startup(args, table_dir, True) for i in xrange(iterations) ])
+            warm = min([ time_startup(args, table_dir, False) for i in xrange(iterations) ])
+            print "%-28s cold: %8.2f ms  warm: %8.2f ms  (%.1fx)" % \
+                  (' '.join(args), cold * 1000.0, warm * 1000.0, cold / warm)
+    finally:
+        shutil.rmtree(table_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+"""
+Preprocesses a generated source that includes the same header many times and
+reports how many bytes each token takes, for the preprocessor output tokens
+and for the tokens the compiler parser is handed.  Every object a token holds
+on to is counted once, so text shared between tokens, like an interned
+identifier, is only paid for once.  The peak memory of the process is
+reported as well.
+
+usage: benchmarks/tokens.py [includes]
+"""
+
+import os
+import sys
+import shutil
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hlakit.common.session import Session
+from hlakit.common.tokenstream import TokenStream
+
+def generate(src_dir, includes):
+    header = []
+    for i in xrange(200):
+        header.append('byte var_%d = %d' % (i, i % 256))
+    fout = open(os.path.join(src_dir, 'vars.h'), 'w')
+    fout.write('\n'.join(header) + '\n')
+    fout.close()
+
+    fpath = os.path.join(src_dir, 'tokens.s')
+    fout = open(fpath, 'w')
+    fout.write('#include "vars.h"\n' * includes)
+    fout.close()
+    return fpath
+
+def attributes(tok):
+    # everything the token refers to, from its __dict__ or its slots
+    d = getattr(tok, '__dict__', None)
+    if d is not None:
+        return [ d ] + d.values()
+    out = []
+    for cls in type(tok).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(tok, name):
+                out.append(getattr(tok, name))
+    return out
+
+def footprint(tokens, ignore):
+    seen = set([ id(o) for o in ignore ])
+    total = 0
+    for t in tokens:
+        for o in [ t ] + attributes(t):
+            if id(o) not in seen:
+                seen.add(id(o))
+                total += sys.getsizeof(o)
+    return total
+
+def main():
+    includes = 100
+    if len(sys.argv) > 1:
+        includes = int(sys.argv[1])
+
+    table_dir = tempfile.mkdtemp()
+    src_dir = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        fpath = generate(src_dir, includes)
+        sys.stdout = open(os.devnull, 'w')
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, '--pp-cache-size=0', fpath])
+        session.initialize_target()
+        lexer = session.lexer()
+        tokens = session.preprocess_file(fpath)[1]
+        stream = TokenStream(session.get_target().lexer(), tokens, lexer)
+        ctokens = list(stream)
+        sys.stdout = stdout
+
+        for (name, toks) in (('pp', tokens), ('compiler', ctokens)):
+            size = footprint(toks, [ stream, lexer, None ])
+            print "%-8s  tokens: %8d  total: %8.1f MB  per token: %6.1f bytes" % \
+                  (name, len(toks), size / (1024.0 * 1024.0), float(size) / len(toks))
+
+        # ru_maxrss is in kilobytes on linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print "peak: %8.1f MB" % (peak / 1024.0)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(table_dir, True)
+        shutil.rmtree(src_dir, True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
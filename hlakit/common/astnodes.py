@@ -0,0 +1,338 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+# every node class in the order they were made, a node's kind is its index
+NODES = []
+
+# the node class of each fixed tag
+TAGS = {}
+
+class NodeType(type):
+    """
+    The metaclass of the AST nodes.  Every node class gets the next small
+    int as its kind and its slots as its fields, so a visitor can dispatch
+    on the kind by indexing a list.  Unless a class names its children, all
+    of its fields are walked.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(NodeType, cls).__init__(name, bases, namespace)
+        if [ b for b in bases if isinstance(b, NodeType) ]:
+            cls.fields = namespace.get('__slots__', ())
+            if 'children' not in namespace:
+                cls.children = cls.fields
+            cls.kind = len(NODES)
+            NODES.append(cls)
+            if cls.tag is not None:
+                TAGS[cls.tag] = cls
+
+class Node(object):
+    """
+    Base of the AST node classes.  A node keeps its fields in slots and can
+    turn itself back into the tuple the parsers have always made.
+    """
+
+    __metaclass__ = NodeType
+    __slots__ = ()
+
+    # the first item of the legacy tuple, None when that item is a field
+    tag = None
+
+    kind = None
+    fields = ()
+
+    # the fields that can hold nodes, the rest are names and numbers
+    children = ()
+
+    def __init__(self, *values):
+        for (i, name) in enumerate(self.fields):
+            if i < len(values):
+                setattr(self, name, values[i])
+            else:
+                setattr(self, name, None)
+
+    def values(self):
+        return tuple([ getattr(self, name) for name in self.fields ])
+
+    @classmethod
+    def from_tuple(cls, t):
+        if cls.tag is None:
+            return cls(*[ from_tuple(v) for v in t ])
+        return cls(*[ from_tuple(v) for v in t[1:] ])
+
+    def to_tuple(self):
+        values = tuple([ to_tuple(v) for v in self.values() ])
+        if self.tag is None:
+            return values
+        return (self.tag,) + values
+
+    def __reduce__(self):
+        return (self.__class__, self.values())
+
+    def __eq__(self, other):
+        return (type(self) is type(other)) and (self.values() == other.values())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join([ repr(v) for v in self.values() ]))
+
+class Program(Node):
+    tag = 'program'
+    __slots__ = ('statements',)
+
+class IncBin(Node):
+    tag = 'incbin'
+    __slots__ = ('blob',)
+    children = ()
+
+class Function(Node):
+    tag = 'function'
+    __slots__ = ('name', 'body', 'noreturn')
+    children = ('body',)
+
+class Interrupt(Node):
+    # the tag is the vector, like interrupt.nmi
+    __slots__ = ('vector', 'name', 'body', 'noreturn')
+    children = ('body',)
+
+class Macro(Node):
+    tag = 'macro'
+    __slots__ = ('name', 'body', 'params')
+    children = ('body',)
+
+class Call(Node):
+    # the tag is the kind of thing called with _call after it
+    __slots__ = ('callee', 'name', 'params')
+    children = ('params',)
+
+    @classmethod
+    def from_tuple(cls, t):
+        return cls(t[0][:-len('_call')], t[1], from_tuple(t[2]))
+
+    def to_tuple(self):
+        return ('%s_call' % self.callee, self.name, to_tuple(self.params))
+
+class Variable(Node):
+    tag = 'variable'
+    __slots__ = ('name', 'type', 'array', 'lengths', 'shared', 'address', 'value')
+    children = ('value',)
+
+class Value(Node):
+    tag = 'value'
+    __slots__ = ('value',)
+
+class Label(Node):
+    tag = 'label'
+    __slots__ = ('name',)
+    children = ()
+
+class Selector(Node):
+    tag = 'selector'
+    __slots__ = ('value',)
+
+class Asm(Node):
+    tag = 'asm'
+    __slots__ = ('opcode', 'operand')
+    children = ('operand',)
+
+class Immediate(Node):
+    tag = 'immediate'
+    __slots__ = ('value',)
+
+class Indirect(Node):
+    tag = 'indirect'
+    __slots__ = ('value',)
+
+class Absolute(Node):
+    tag = 'absolute'
+    __slots__ = ('value',)
+
+class AbsIdx(Node):
+    tag = 'abs_idx'
+    __slots__ = ('value', 'register')
+    children = ('value',)
+
+class AbsInd(Node):
+    tag = 'abs_ind'
+    __slots__ = ('value', 'register')
+    children = ('value',)
+
+class ZpInd(Node):
+    tag = 'zp_ind'
+    __slots__ = ('value', 'register')
+    children = ('value',)
+
+class If(Node):
+    tag = 'if'
+    __slots__ = ('condition', 'body', 'orelse')
+
+    def to_tuple(self):
+        # there's no else in the tuple when there isn't one
+        t = Node.to_tuple(self)
+        if self.orelse is None:
+            return t[:-1]
+        return t
+
+class While(Node):
+    tag = 'while'
+    __slots__ = ('condition', 'body')
+
+class DoWhile(Node):
+    tag = 'do_while'
+    __slots__ = ('condition', 'body')
+
+class Forever(Node):
+    tag = 'forever'
+    __slots__ = ('body',)
+
+class Switch(Node):
+    tag = 'switch'
+    __slots__ = ('register', 'blocks')
+    children = ('blocks',)
+
+class Condition(Node):
+    tag = 'conditional_clause'
+    __slots__ = ('condition', 'modifier', 'distance')
+    children = ()
+
+class PlatformStatement(Node):
+    tag = 'nes_pp_statement'
+    __slots__ = ('name', 'args')
+    children = ()
+
+class Unary(Node):
+    __slots__ = ('op', 'operand')
+    children = ('operand',)
+
+class Binary(Node):
+    __slots__ = ('op', 'left', 'right')
+    children = ('left', 'right')
+
+class ImmediateFn(Node):
+    # lo(), hi(), nylo(), nyhi() and sizeof()
+    __slots__ = ('fn', 'arg')
+    children = ('arg',)
+
+UNARY_OPS = frozenset([ '~', '!', '-', '+' ])
+BINARY_OPS = frozenset([ '|', '^', '&', '==', '!=', '<', '>', '<=', '>=',
+                         '<<', '>>', '+', '-', '*', '/', '%' ])
+IMMEDIATE_FNS = frozenset([ 'lo', 'hi', 'nylo', 'nyhi', 'sizeof' ])
+
+def _node_class(t):
+    tag = t[0]
+    if not isinstance(tag, basestring):
+        return None
+    cls = TAGS.get(tag, None)
+    if cls is not None:
+        return cls
+    if tag.endswith('_call'):
+        return Call
+    if tag.startswith('interrupt'):
+        return Interrupt
+    if len(t) == 2:
+        if tag.lower() in IMMEDIATE_FNS:
+            return ImmediateFn
+        if tag in UNARY_OPS:
+            return Unary
+    if (len(t) == 3) and (tag in BINARY_OPS):
+        return Binary
+    return None
+
+def from_tuple(t):
+    """
+    Turns the tuples a parser made into nodes, all the way down.  Lists stay
+    lists, and a list with nothing to turn, like a selector, is kept as it
+    is.  A tuple that isn't a known node is left alone too, so passes can
+    move over to the nodes one at a time.
+    """
+    if isinstance(t, tuple) and len(t):
+        cls = _node_class(t)
+        if cls is not None:
+            return cls.from_tuple(t)
+    elif isinstance(t, list):
+        items = [ from_tuple(i) for i in t ]
+        for (a, b) in zip(items, t):
+            if a is not b:
+                return items
+    return t
+
+def to_tuple(n):
+    # the legacy tuples again, from_tuple() the other way around
+    if isinstance(n, Node):
+        return n.to_tuple()
+    if isinstance(n, list):
+        items = [ to_tuple(i) for i in n ]
+        for (a, b) in zip(items, n):
+            if a is not b:
+                return items
+    return n
+
+class Visitor(object):
+    """
+    Walks a tree of nodes.  A subclass handles a node class by having a
+    visit_<class name> method, everything else goes to generic_visit(),
+    which visits the fields.  The methods are looked up once, into a list
+    indexed by the node kind, so a visit is a list index and a call.
+    """
+
+    def __init__(self):
+        self._build_table()
+
+    def _build_table(self):
+        self._table = [ getattr(self, 'visit_%s' % cls.__name__, self.generic_visit)
+                        for cls in NODES ]
+
+    def visit(self, node):
+        if len(self._table) != len(NODES):
+            # node classes were made after the table was
+            self._build_table()
+        if isinstance(node, Node):
+            return self._table[node.kind](node)
+        if isinstance(node, list):
+            self._visit_list(node)
+        return None
+
+    def _visit_list(self, nodes):
+        table = self._table
+        for n in nodes:
+            if isinstance(n, Node):
+                table[n.kind](n)
+            elif isinstance(n, list):
+                self._visit_list(n)
+
+    def generic_visit(self, node):
+        table = self._table
+        for name in node.children:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                table[value.kind](value)
+            elif isinstance(value, list):
+                self._visit_list(value)
@@ -31,8 +31,10 @@ from type_ import Type_
 
 class BaseType(Type_):
 
-    def __init__(self, name):
+    def __init__(self, name, size=None, align=1):
         super(BaseType, self).__init__(name)
+        self.size = size
+        self.align = align
 
     def __str__(self):
         return self.name
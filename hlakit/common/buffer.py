@@ -31,6 +31,7 @@ import os
 import sys
 from struct import *
 from math import floor, ceil, log
+from incbin import IncBin
 
 class Buffer(object):
     """
@@ -41,7 +42,7 @@ class Buffer(object):
     BYTE_ORDER = ''
 
     def __init__(self, org=None, maxsize=None, padding=0):
-        self._buffer = []
+        self._buffer = bytearray()
         self._org = org
         self._maxsize = maxsize
         self._current_pos = 0
@@ -107,36 +108,40 @@ class Buffer(object):
         return self._org
 
     def save(self, outf):
-        for b in self._buffer:
-            outf.write(b)
+        outf.write(self._buffer)
 
     def load(self, fpath):
-        # stat the file to check its size
-        statinfo = os.stat(fpath)
+        return self.append_blob(IncBin(fpath))
 
-        # check the maxsize 
-        if self._maxsize != None:
-            if (self._current_pos + statinfo.st_size) > self._maxsize:
-                print 'WARNING: buffer load size exceeds the specified maxsize, truncating'
-            size = min(self._current_pos + statinfo.st_size, maxsize)
-        else:
-            size = statinfo.st_size
-
-        # read in the data
-        inf = open(fpath, 'r')
-        data = inf.read(size)
-        inf.close()
+    def fits(self, size):
+        # true if size more bytes fit after the current position
+        if self._maxsize is None:
+            return True
+        return (self._current_pos + size) <= self._maxsize
+
+    def append_blob(self, blob):
+        """
+        Copies an #incbin payload in at the current position with a single
+        slice assignment.  The size check only uses the blob's size, so
+        nothing is read from a blob that doesn't fit.
+        """
+        start = self._current_pos
+        size = blob.size
 
-        # check the length of the data read against what was expected
-        if len(data) != size:
-            print 'WARNING: expected buffer size does not match the amount of data read'
+        # check the maxsize
+        if not self.fits(size):
+            print 'WARNING: buffer load size exceeds the specified maxsize, truncating'
+            size = self._maxsize - start
 
         # extend the buffer if needed
-        if len(self._buffer) < (self._current_pos + size):
-            self.reserve(self._current_pos + size)
+        if len(self._buffer) < (start + size):
+            self.reserve(start + size)
 
         # store the data in the buffer
-        self._buffer[self._current_pos:size] = data
+        self._buffer[start:start + size] = blob.view(0, size)
+        self._current_pos += size
+
+        return size
 
     def set_padding_value(self, value):
         if isinstance(value, str) or isinstance(value, int):
@@ -155,9 +160,12 @@ class Buffer(object):
 
         # figure out how much we need to extend the buffer
         ext = size - len(self._buffer) 
+        if ext <= 0:
+            # already big enough, reserve never shrinks the buffer
+            return
 
         # extend the buffer
-        self._buffer.extend([None] * ext)
+        self._buffer.extend(bytearray(ext))
 
         # fill with padding value
         self._pad_buffer(pad_start, ext)
@@ -170,7 +178,7 @@ class Buffer(object):
         if self._maxsize is None:
 
             # make room for the data
-            self.reserve(len(bytes))
+            self.reserve(start + len(bytes))
 
             # calculate the end
             end = self._current_pos + len(bytes)
@@ -0,0 +1,168 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import threading
+
+class CompileContext(object):
+    """
+    Owns everything one compilation works with: the session with its options,
+    target and include stack, the symbols, the types and the line table.
+    Session, SymbolTable, Types and LineTable instances all share their state
+    with every other instance of the same class in the context that is
+    active in the calling thread, so the rest of the compiler keeps getting
+    at them the way it always has.  A thread that never activates a context
+    uses one process wide default, which is how things worked before there
+    were contexts.  Independent compilations run side by side by giving each
+    thread its own context:
+
+        with CompileContext() as context:
+            session = Session()
+            ...
+    """
+
+    _local = threading.local()
+    _default = None
+
+    # the state classes by the name of their state, see ContextStateType
+    _classes = {}
+
+    def __init__(self):
+        self._states = {}
+        self._saved = []
+
+    @classmethod
+    def current(cls):
+        context = getattr(cls._local, 'context', None)
+        if context is None:
+            if cls._default is None:
+                cls._default = CompileContext()
+            context = cls._default
+        return context
+
+    def activate(self):
+        """
+        Makes this the context of the calling thread and returns the one it
+        replaces, None when that was the process wide default.
+        """
+        previous = getattr(self._local, 'context', None)
+        self._local.context = self
+        return previous
+
+    @classmethod
+    def restore(cls, previous):
+        # puts back the context activate() returned
+        cls._local.context = previous
+
+    def __enter__(self):
+        self._saved.append(self.activate())
+        return self
+
+    def __exit__(self, *exc_info):
+        self.restore(self._saved.pop())
+        return False
+
+    def get_state(self, name):
+        state = self._states.get(name, None)
+        if state is None:
+            state = {}
+            self._states[name] = state
+        return state
+
+    def set_state(self, name, state):
+        self._states[name] = state
+
+    def bind(self, cls):
+        """
+        Returns an instance of a state class that uses this context no matter
+        which context the calling thread has active.
+        """
+        state = self.get_state(cls._state_name)
+        obj = object.__new__(cls)
+        obj.__dict__ = state
+        if not state:
+            obj.init_state()
+        return obj
+
+    @property
+    def session(self):
+        return self.bind(self._classes['session'])
+
+    @property
+    def target(self):
+        return self.session.get_target()
+
+    @property
+    def symbols(self):
+        return self.bind(self._classes['symbols'])
+
+    @property
+    def types(self):
+        return self.bind(self._classes['types'])
+
+    @property
+    def lines(self):
+        return self.bind(self._classes['lines'])
+
+class ContextStateType(type):
+    """
+    The metaclass of the state classes.  It registers them with the context
+    and turns the class level _shared_state they used to have into the state
+    in the current context, so reading, clearing or replacing it still works.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(ContextStateType, cls).__init__(name, bases, namespace)
+        if namespace.get('_state_name', None) is not None:
+            CompileContext._classes[cls._state_name] = cls
+
+    @property
+    def _shared_state(cls):
+        return CompileContext.current().get_state(cls._state_name)
+
+    @_shared_state.setter
+    def _shared_state(cls, state):
+        CompileContext.current().set_state(cls._state_name, state)
+
+class ContextState(object):
+    """
+    Base of the classes that keep one shared state per compile context,
+    every instance made in the same context shares the same attributes.
+    """
+
+    __metaclass__ = ContextStateType
+
+    # the name the context keeps the state under
+    _state_name = None
+
+    def __new__(cls, *a, **k):
+        return CompileContext.current().bind(cls)
+
+    def init_state(self):
+        # called when the state in a context is still empty
+        pass
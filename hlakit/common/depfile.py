@@ -0,0 +1,79 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+from collections import OrderedDict
+
+class DepFile(object):
+    """
+    Collects every file the preprocessor reads, the sources, the headers
+    they include and the binaries pulled in with #incbin, and writes them out
+    as a make rule so make or ninja can tell when the output is stale.
+    """
+
+    def __init__(self):
+        self._paths = OrderedDict()
+
+    def add(self, path):
+        self._paths[os.path.abspath(path)] = True
+
+    def get_paths(self):
+        return self._paths.keys()
+
+    @staticmethod
+    def _escape(path):
+        return path.replace('$', '$$').replace(' ', '\\ ').replace('#', '\\#')
+
+    def _rel(self, path):
+        try:
+            return os.path.relpath(path)
+        except ValueError:
+            return path
+
+    def write(self, fpath, target, phony=False):
+        """
+        Writes 'target: deps' to fpath.  With phony set every dependency but
+        the first gets an empty rule of its own, so make doesn't fail when a
+        header is deleted.
+        """
+        deps = [ self._escape(self._rel(p)) for p in self._paths.iterkeys() ]
+
+        lines = [ '%s:' % self._escape(target) ]
+        for dep in deps:
+            lines[-1] += ' \\'
+            lines.append('  %s' % dep)
+        text = '\n'.join(lines) + '\n'
+
+        if phony:
+            for dep in deps[1:]:
+                text += '\n%s:\n' % dep
+
+        fout = open(fpath, 'w')
+        fout.write(text)
+        fout.close()
@@ -0,0 +1,69 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+class DirectiveLexer(object):
+    """
+    Lexes every directive with one rule that matches a '#' and a dotted name,
+    the name is then looked up in the 'directives' table with the whitespace
+    removed and the letters lower cased.  A target adds its own directives by
+    adding entries to the table, the master regex doesn't grow at all.  A '#'
+    followed by a name that isn't a directive is lexed as a HASH and the name
+    is lexed again on its own.
+    """
+
+    # lower case directive name -> token type
+    directives = {}
+
+    def t_PPDIRECTIVE(self, t):
+        r'\#[\t ]*[a-zA-Z_][\w]*(?:[\t ]*\.[\t ]*[a-zA-Z_][\w]*)*'
+        type_ = self.directives.get(''.join(t.value[1:].split()).lower(), None)
+        if type_ is None:
+            t.type = 'HASH'
+            t.value = '#'
+            t.lexer.lexpos = t.lexpos + 1
+            return t
+        t.type = type_
+        return self.directive(t)
+
+    def directive(self, t):
+        """
+        Called with every directive token once its type is set, a directive
+        that takes more of the input than its name extends the token here.
+        """
+        return t
+
+    @classmethod
+    def extend_directives(cls, directives):
+        """
+        Returns the directives table of this class with the given entries
+        added, for building the table of a subclass.
+        """
+        table = dict(cls.directives)
+        table.update(directives)
+        return table
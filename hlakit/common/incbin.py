@@ -0,0 +1,95 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import mmap
+import hashlib
+
+class IncBin(object):
+    """
+    The payload of an #incbin.  The size comes from stat'ing the file so
+    asking how big the blob is never reads it.  The file is memory mapped the
+    first time its data is needed, and the data is only copied when it is
+    written into an output buffer.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.size = os.stat(self.path).st_size
+        self._digest = None
+        self._map = None
+
+    def __len__(self):
+        return self.size
+
+    def _mapped(self):
+        if self._map is None:
+            fin = open(self.path, 'rb')
+            try:
+                # an empty file can't be mapped
+                if self.size == 0:
+                    self._map = ''
+                else:
+                    self._map = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                fin.close()
+        return self._map
+
+    def is_mapped(self):
+        return self._map is not None
+
+    def get_digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha1(self._mapped()).hexdigest()
+        return self._digest
+
+    def view(self, offset=0, size=None):
+        """
+        Returns a read only slice of the data without copying it.  Python 2's
+        mmap doesn't support memoryview, so the slice is a buffer object.
+        """
+        if size is None:
+            size = self.size - offset
+        return buffer(self._mapped(), offset, size)
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        self._map = None
+
+    def __getstate__(self):
+        # the mapping belongs to this process, it is made again on demand
+        state = dict(self.__dict__)
+        state['_map'] = None
+        return state
+
+    def __str__(self):
+        return 'IncBin -- Path: %s, Size: 0x%0.4x' % (self.path, self.size)
+
+    __repr__ = __str__
@@ -0,0 +1,88 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import re
+
+class IncludeGuards(object):
+    """
+    This remembers which files are wrapped in an include guard:
+
+        #ifndef X
+        ...
+        #endif
+
+    with nothing but whitespace and comments outside of the block.  Once a
+    file is known to be guarded, including it again while X is defined would
+    only produce a disabled block so the include is skipped without opening
+    the file.
+    """
+
+    COMMENT = re.compile(r'(/\*([^*]|[\r\n]|(\*+([^*/]|[\r\n])))*\*+/)|(//[^\n]*)')
+    GUARD = re.compile(r'\s*\#[\t ]*ifndef[\t ]+([a-zA-Z_]\w*)[\t ]*(\n|$)', re.I)
+    DIRECTIVE = re.compile(r'^[\t ]*\#[\t ]*(ifdef|ifndef|else|endif)\b[^\n]*', re.I | re.M)
+
+    def __init__(self):
+        self._guards = {}
+        self.elided = 0
+
+    def detect(self, text):
+        # returns the guard macro name or None
+        text = self.COMMENT.sub(' ', text)
+        m = self.GUARD.match(text)
+        if m is None:
+            return None
+
+        # find the #endif matching the guard
+        depth = 1
+        for d in self.DIRECTIVE.finditer(text, m.end()):
+            directive = d.group(1).lower()
+            if directive in ('ifdef', 'ifndef'):
+                depth += 1
+            elif directive == 'else':
+                if depth == 1:
+                    return None
+            elif directive == 'endif':
+                depth -= 1
+                if depth == 0:
+                    if len(text[d.end():].strip()) > 0:
+                        return None
+                    return m.group(1)
+        return None
+
+    def add(self, path, guard):
+        if guard is not None:
+            self._guards[path] = guard
+
+    def get_guard(self, path):
+        return self._guards.get(path, None)
+
+    def __str__(self):
+        return 'IncludeGuards -- Files: %d, Elided: %d' % (len(self._guards), self.elided)
+
+    __repr__ = __str__
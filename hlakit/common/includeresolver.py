@@ -0,0 +1,97 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+
+class IncludeResolver(object):
+    """
+    This resolves #include and #incbin file names against the search paths.
+    Every directory that gets searched is listed once and the listing is
+    kept, and every resolved name (including the ones that weren't found) is
+    remembered, so after warm-up resolving a file costs a dict lookup and no
+    system calls.  refresh() re-stats the listed directories and throws away
+    whatever changed since they were listed.
+    """
+
+    def __init__(self, include_dirs=[]):
+        self._cwd = os.getcwd()
+        self._include_dirs = [ os.path.join(self._cwd, d) for d in include_dirs ]
+        self._listings = {}
+        self._resolved = {}
+
+    def _listing(self, d):
+        listing = self._listings.get(d, None)
+        if listing is None:
+            try:
+                listing = (os.stat(d).st_mtime, frozenset(os.listdir(d)))
+            except OSError:
+                listing = (None, frozenset())
+            self._listings[d] = listing
+        return listing[1]
+
+    def _exists(self, path):
+        (d, name) = os.path.split(path)
+        return name in self._listing(d)
+
+    def resolve(self, f, cur_dir=None, inc_dirs=False):
+        # if it starts with a '/' then it is an absolute path
+        if f[0] == '/':
+            return f
+
+        key = (f, cur_dir, inc_dirs)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        # the current file dir, then cwd and then the include dirs
+        search_paths = []
+        if cur_dir:
+            search_paths.append(os.path.join(self._cwd, cur_dir))
+        search_paths.append(self._cwd)
+        if inc_dirs:
+            search_paths.extend(self._include_dirs)
+
+        path = None
+        for d in search_paths:
+            test_path = os.path.normpath(os.path.join(d, f))
+            if self._exists(test_path):
+                path = test_path
+                break
+
+        self._resolved[key] = path
+        return path
+
+    def refresh(self):
+        for (d, listing) in self._listings.items():
+            try:
+                mtime = os.stat(d).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != listing[0]:
+                del self._listings[d]
+                self._resolved.clear()
@@ -29,8 +29,9 @@ or implied, of David Huseby.
 
 from session import Session
 from types import Types
+from directivelexer import DirectiveLexer
 
-class Lexer(object):
+class Lexer(DirectiveLexer):
 
     # hla reserved tokens
     reserved = {
@@ -83,14 +84,16 @@ class Lexer(object):
 
     literals    = '.+-*/~!%><=&^|{}()[]:,'
 
-    t_PPINCBIN  = r'\#(?i)[\t ]*incbin'
+    # the directives left in the token stream for the compiler
+    directives  = { 'incbin':   'PPINCBIN' }
+
     t_INTERRUPT = r'interrupt'
     t_HASH      = r'\#'
     t_STRING    = r'\"(\\.|[^\"])*\"'
     t_BSTRING   = r'\<(\\.|[^\>])*\>'
     t_DECIMAL   = r'(0(?![xX])|[1-9][0-9]*)'
     t_KILO      = r'(0(?![xX])|[1-9][0-9]*)[kK]'
-    t_HEXC      = r'0x[0-9a-fA-F]+'
+    t_HEXC      = r'0[xX][0-9a-fA-F]+'
     t_HEXS      = r'\$[0-9a-fA-F]+'
     t_BINARY    = r'%[01]+'
     t_RSHIFT    = r'>>'
@@ -117,20 +120,70 @@ class Lexer(object):
     def t_ID(self, t):
         r'[a-zA-Z_][\w]*'
 
-        # case sensitive
-        t.type = self.reserved.get(t.value, None) # check for reserved words
-        if t.type != None:
-            return t
-        
-        # case sensitive lookup to check for type name
-        tr = Types().lookup_type(t.value)
-        if tr != None:
-            t.type = 'TYPE'
+        # rebuild the type names in the classifier when the types change
+        if Types.version() != self._types_version:
+            self._update_classifier()
+
+        c = self._classifier.get(t.value, None)
+        if c is None:
+            # identifiers are interned so the symbol lookups that follow are
+            # pointer compares
+            t.type = 'ID'
+            t.value = intern(t.value)
             return t
 
-        t.type = 'ID'
+        t.type = c[0]
+        if c[1] is not None:
+            t.value = c[1]
         return t
 
+    def id_classes(self):
+        """
+        Returns the (words, case insensitive) pairs that classify identifiers,
+        a later entry wins over an earlier one.  Case insensitive words match
+        in any capitalization and the token value becomes the lower case word.
+        Type names come below all of them.
+        """
+        return [ (self.reserved, False) ]
+
+    @staticmethod
+    def _spellings(word):
+        # every capitalization of the word
+        out = [ '' ]
+        for c in word:
+            out = [ s + v for s in out for v in set([ c.lower(), c.upper() ]) ]
+        return out
+
+    def _static_classifier(self):
+        # the words are fixed for a target so the table is built once per
+        # lexer class and shared by all of its instances
+        cls = type(self)
+        table = cls.__dict__.get('_static_ids', None)
+        if table is None:
+            table = {}
+            for (words, nocase) in self.id_classes():
+                for (word, type_) in words.iteritems():
+                    if not nocase:
+                        table[word] = (type_, None)
+                        continue
+                    for spelling in self._spellings(word):
+                        table[spelling] = (type_, word)
+            cls._static_ids = table
+        return table
+
+    def _update_classifier(self):
+        # only the type names that changed are touched, the fixed words
+        # always win over a type of the same name
+        static = self._static_classifier()
+        types = Types.get_table()
+        for name in self._type_names.difference(types):
+            del self._classifier[name]
+        for name in types.iterkeys():
+            if (name not in self._classifier) and (name not in static):
+                self._classifier[name] = ('TYPE', None)
+        self._type_names = set([ n for n in types.iterkeys() if n not in static ])
+        self._types_version = Types.version()
+
     def t_COMMENT(self, t):
         r'(/\*([^*]|[\r\n]|(\*+([^*/]|[\r\n])))*\*+/)|(//.*)'
         t.lexer.lineno += t.value.count("\n")
@@ -143,5 +196,7 @@ class Lexer(object):
         return t
 
     def __init__(self):
-        pass
+        self._classifier = dict(self._static_classifier())
+        self._type_names = set()
+        self._types_version = None
 
@@ -0,0 +1,165 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+from array import array
+from bisect import bisect_right
+from compilecontext import ContextState
+
+class LineTable(ContextState):
+    """
+    Maps token positions back to the file and line they came from.
+
+    A position is a single int.  Whenever the preprocessor starts or resumes
+    reading a file a run begins at the next free position, and the positions
+    in a run count the lines from where the run began.  The runs are kept in
+    three parallel arrays (start position, file id, first line), so a
+    position is resolved with one binary search, and the common case of
+    resolving positions in order doesn't search at all.
+
+    File ids index the include tree: every file that is read gets an id
+    recording its path and the position of the #include that pulled it in.
+    Position 0 and file id 0 mean unknown.
+    """
+
+    _state_name = 'lines'
+
+    def reset_state(self):
+        self._paths = [ None ]
+        self._parents = array('l', [ 0 ])
+        self._starts = array('l', [ 0 ])
+        self._fids = array('l', [ 0 ])
+        self._lines = array('l', [ 0 ])
+        self._next = 1
+        self._last = 0
+        self._roots = {}
+
+    def _check(self):
+        if not hasattr(self, '_paths'):
+            self.reset_state()
+
+    def add_file(self, path, parent=0):
+        """
+        Returns a new file id for path, parent is the position of the
+        #include that reads it.
+        """
+        self._check()
+        self._paths.append(path)
+        self._parents.append(parent)
+        return len(self._paths) - 1
+
+    def get_file_id(self, path):
+        # files that come from a cache or another process have no include
+        # position, they share one id per path
+        self._check()
+        fid = self._roots.get(path, None)
+        if fid is None:
+            fid = self.add_file(path)
+            self._roots[path] = fid
+        return fid
+
+    def get_path(self, fid):
+        self._check()
+        return self._paths[fid]
+
+    def get_parent(self, fid):
+        self._check()
+        return self._parents[fid]
+
+    def position(self, fid, line):
+        """
+        Returns the position of the given line of a file.  Lines of the file
+        that is being read carry on its current run, anything else starts a
+        new run.
+        """
+        self._check()
+        i = len(self._starts) - 1
+        if (self._fids[i] != fid) or (line < self._lines[i]) or (i == 0):
+            self._starts.append(self._next)
+            self._fids.append(fid)
+            self._lines.append(line)
+            i += 1
+        pos = self._starts[i] + line - self._lines[i]
+        if pos >= self._next:
+            self._next = pos + 1
+        return pos
+
+    def locate(self, path, line):
+        return self.position(self.get_file_id(path), line)
+
+    def _run(self, pos):
+        i = self._last
+        starts = self._starts
+        if (starts[i] <= pos) and ((i + 1 == len(starts)) or (pos < starts[i + 1])):
+            return i
+        i = bisect_right(starts, pos) - 1
+        self._last = i
+        return i
+
+    def resolve(self, pos):
+        """
+        Returns the (file id, line) of a position.
+        """
+        self._check()
+        if pos <= 0:
+            return (0, 0)
+        i = self._run(pos)
+        return (self._fids[i], self._lines[i] + pos - self._starts[i])
+
+    def get_location(self, pos):
+        # the (path, line) of a position
+        (fid, line) = self.resolve(pos)
+        return (self._paths[fid], line)
+
+    def get_include_chain(self, pos):
+        """
+        Returns the (path, line) of the position followed by the (path, line)
+        of each #include that led to it, outermost last.
+        """
+        chain = []
+        while pos > 0:
+            (fid, line) = self.resolve(pos)
+            chain.append( (self._paths[fid], line) )
+            pos = self._parents[fid]
+        return chain
+
+    def describe(self, pos):
+        chain = self.get_include_chain(pos)
+        if len(chain) == 0:
+            return 'unknown position'
+        s = '%s:%d' % chain[0]
+        for loc in chain[1:]:
+            s += ', included from %s:%d' % loc
+        return s
+
+    def __str__(self):
+        self._check()
+        return 'LineTable -- Files: %d, Runs: %d, Positions: %d' % \
+               (len(self._paths) - 1, len(self._starts) - 1, self._next - 1)
+
+    __repr__ = __str__
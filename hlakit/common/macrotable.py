@@ -0,0 +1,105 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+from symboltable import SymbolTable
+from ppmacro import PPMacro
+
+class MacroTable(object):
+    """
+    Memoizes macro lookups for the preprocessor.  Each name maps to the
+    macro it resolved to, or None, and for object-like macros the fully
+    expanded replacement as a tuple of (type, value, hide set).  An entry
+    remembers the symbol table generation of every name it looked at, so a
+    #define or #undef only invalidates the entries that depend on that name.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, name):
+        """
+        Returns (deps, macro, expansion).  deps is a tuple of (name, stamp,
+        macro) for every name the entry depends on, expansion is None unless
+        the macro is object-like and expands without help from the tokens
+        that follow it.
+        """
+        entry = self._entries.get(name)
+        if entry is not None:
+            st = SymbolTable()
+            for (dep, stamp, macro) in entry[0]:
+                if st.generation(dep) != stamp:
+                    break
+            else:
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        entry = self._build(name)
+        self._entries[name] = entry
+        return entry
+
+    def _build(self, name):
+        st = SymbolTable()
+        macro = PPMacro.lookup(name)
+        deps = { name: (st.generation(name), macro) }
+        expansion = None
+        if (macro is not None) and not macro.is_function():
+            out = []
+            if self._flatten(macro, frozenset([ name ]), out, deps):
+                expansion = tuple(out)
+
+        deps = tuple([ (n, stamp, m) for (n, (stamp, m)) in deps.iteritems() ])
+        return (deps, macro, expansion)
+
+    def _flatten(self, macro, hideset, out, deps):
+        st = SymbolTable()
+        for t in macro.expand():
+            type_ = getattr(t, 'type', None) or 'ID'
+            v = getattr(t, 'value', t)
+            if (type_ == 'ID') and (v not in hideset):
+                m = PPMacro.lookup(v)
+                if v not in deps:
+                    deps[v] = (st.generation(v), m)
+                if m is not None:
+                    # function-like macros need the tokens that follow
+                    if m.is_function():
+                        return False
+                    if not self._flatten(m, hideset | frozenset([ m.name ]), out, deps):
+                        return False
+                    continue
+            out.append((type_, v, hideset))
+        return True
+
+    def __str__(self):
+        return 'MacroTable -- Names: %d, Hits: %d, Misses: %d' % \
+               (len(self._entries), self.hits, self.misses)
+
+    __repr__ = __str__
@@ -27,10 +27,12 @@ authors and should not be interpreted as representing official policies, either
 or implied, of David Huseby.
 """
 
+from session import Session
 from symboltable import SymbolTable
 from types import Types
 from arraytype import ArrayType
 from structtype import StructType
+from typelayout import MemberSelector, number_value
 
 class Parser(object):
 
@@ -47,10 +49,11 @@ class Parser(object):
             else:
                 p[0] = ('program', [ p[1] ])
         elif len(p) == 3:
-            if p[2] is None:
-                p[0] = p[1]
-            else:
-                p[0] = ('program', p[1][1] + [ p[2] ])
+            # append in place, copying the statement list on every
+            # reduction makes parsing quadratic in the file length
+            p[0] = p[1]
+            if p[2] is not None:
+                p[0][1].append(p[2])
 
     def p_common_statement(self, p):
         '''common_statement : core_statement
@@ -66,6 +69,7 @@ class Parser(object):
     def p_core_pp_statement(self, p):
         '''core_pp_statement : PPINCBIN filename'''
         print "Including binary file: %s..." % p[2]
+        p[0] = ('incbin', Session().get_incbin(p[2][1:-1]))
 
     def p_core_statement(self, p):
         '''core_statement : common_token
@@ -75,17 +79,17 @@ class Parser(object):
                 p[0] = []
                 return
             if isinstance(p[1], list):
-                p[0] = p[1]
+                p[0] = list(p[1])
             else:
                 p[0] = [ p[1] ]
         elif len(p) == 3:
+            p[0] = p[1]
             if p[2] is None:
-                p[0] = p[1]
                 return
             if isinstance(p[2], list):
-                p[0] = p[1] + p[2]
+                p[0].extend(p[2])
             else:
-                p[0] = p[1] + [ p[2] ]
+                p[0].append(p[2])
 
     def p_interrupt_statement(self, p):
         '''interrupt_statement : INTERRUPT noreturn ID '(' ')' '{' function_body '}' '''
@@ -114,10 +118,9 @@ class Parser(object):
             else:
                 p[0] = [ p[1] ]
         else:
-            if p[2] is None:
-                p[0] = p[1]
-            else:
-                p[0] = p[1] + [ p[2] ]
+            p[0] = p[1]
+            if p[2] is not None:
+                p[0].append(p[2])
 
     def p_function_body_statement(self, p):
         '''function_body_statement : RETURN
@@ -239,6 +242,10 @@ class Parser(object):
             #                   name  type  array  array len  shared  address  value
             p[0] = ('variable', p[3], p[2], True,  arrlen,    p[1],   p[5],    p[6])
 
+        # remember the type so selectors and sizeof can use its layout
+        if p[3] is not None:
+            SymbolTable().new_symbol(p[3], p[0])
+
     def p_shared(self, p):
         '''shared : SHARED
                   | empty'''
@@ -427,9 +434,66 @@ class Parser(object):
                         | HI '(' immediate_expression ')'
                         | NYLO '(' immediate_expression ')'
                         | NYHI '(' immediate_expression ')'
-                        | SIZEOF '(' immediate_expression ')' '''
+                        | SIZEOF '(' immediate_expression ')'
+                        | SIZEOF '(' TYPE ')' '''
+        if p.slice[1].type == 'SIZEOF':
+            if p.slice[3].type == 'TYPE':
+                size = Types().sizeof(p[3])
+            else:
+                size = self._sizeof(p[3])
+            if size is not None:
+                p[0] = str(size)
+                return
         p[0] = (p[1], p[3])
 
+    def _selector_variable(self, selector):
+        """
+        Returns the variable a selector starts with, the dotted member path
+        that follows it and whatever comes after that.
+        """
+        var = SymbolTable().lookup_symbol(selector[0])
+        if not isinstance(var, tuple) or (var[0] != 'variable'):
+            return (None, None, None)
+        i = 1
+        while (i < len(selector)) and (selector[i] not in ('+', '-')):
+            i += 1
+        return (var, '.'.join(selector[1:i]), selector[i:])
+
+    def _sizeof(self, expr):
+        # the size of a variable or one of its members, if the layout is known
+        if isinstance(expr, MemberSelector):
+            if len(expr) > 3:
+                return None
+            return Types().sizeof(expr.type_name)
+        if not isinstance(expr, list):
+            return None
+        (var, path, rest) = self._selector_variable(expr)
+        if (var is None) or len(path) or len(rest):
+            return None
+        size = Types().sizeof(var[2])
+        if (size is not None) and var[3]:
+            # an array variable takes the size of every record
+            for l in var[4]:
+                l = number_value(l)
+                if l is None:
+                    return None
+                size *= l
+        return size
+
+    def _resolve_selector(self, selector):
+        """
+        Turns the members of a variable in a selector into a constant offset
+        from the variable.  Anything that doesn't resolve stays the way it
+        was.
+        """
+        (var, path, rest) = self._selector_variable(selector)
+        if (var is None) or not len(path):
+            return selector
+        member = Types().member(var[2], path)
+        if member is None:
+            return selector
+        return MemberSelector([ selector[0], '+', str(member[0]) ] + rest, member[1])
+
     def p_number(self, p):
         '''number : DECIMAL
                   | KILO
@@ -446,7 +510,10 @@ class Parser(object):
     def p_value(self, p):
         '''value : number
                  | selector'''
-        p[0] = p[1]
+        if isinstance(p[1], list):
+            p[0] = self._resolve_selector(p[1])
+        else:
+            p[0] = p[1]
 
     def p_selector(self, p):
         '''selector : ID
@@ -0,0 +1,264 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import hashlib
+import cPickle
+from collections import OrderedDict
+from symboltable import SymbolTable
+from ppmacro import PPMacro
+
+def macro_fingerprint(macro):
+    if macro is None:
+        return None
+    value = macro.value
+    if value is not None:
+        value = [ getattr(v, 'value', v) for v in value ]
+    return repr((value, macro.arglist))
+
+class PPCacheEntry(object):
+    """
+    The recorded result of preprocessing one file: the output tokens, the
+    side effects (#define, #undef, target settings and messages) in the order
+    they happened, the incoming macros the file tested and the digests of
+    every file it included.
+    """
+
+    def __init__(self, path, digest):
+        self.path = path
+        self.digest = digest
+        self.tokens = []
+        self.events = []
+        self.lookups = {}
+        self.deps = {}
+        self.guard = None
+        self.touched = set()
+
+class PPCache(object):
+    """
+    This memoizes the preprocessor output of files.  Entries are keyed by the
+    absolute path of the file and a hash of its contents and each key can
+    hold a few variants that differ in the incoming macro state.  A variant
+    is only used when every macro the file tested still has the same value
+    and every file it included is unchanged; on a hit the recorded side
+    effects are replayed instead of parsing the file again.
+
+    The in-memory tier is an LRU of at most 'size' files, the optional disk
+    tier stores the variants of each file in 'cache_dir'.  The disk tier is
+    shared between runs, so its keys also hold the target and the include
+    search path, either one can change what a file preprocesses to.
+    """
+
+    MAX_VARIANTS = 8
+
+    # bump this when the format of the entries changes
+    FORMAT = 5
+
+    def __init__(self, size=256, cache_dir=None, target=None, include_dirs=[]):
+        self._size = size
+        self._dir = cache_dir
+        self._target = target
+        self._include_dirs = [ os.path.abspath(d) for d in include_dirs ]
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._digests = {}
+        self._recorders = []
+        # the entry of the last hit or the last file recorded
+        self.last = None
+        self.hits = 0
+        self.misses = 0
+
+    def is_enabled(self):
+        return self._size > 0
+
+    def digest(self, path):
+        # only rehash a file when its size or mtime changed
+        st = os.stat(path)
+        stamp = (st.st_mtime, st.st_size)
+        known = self._digests.get(path, None)
+        if known and known[0] == stamp:
+            return known[1]
+
+        fin = open(path, 'rb')
+        digest = hashlib.md5(fin.read()).hexdigest()
+        fin.close()
+        self._digests[path] = (stamp, digest)
+        return digest
+
+    def pin(self, entry, stamps={}):
+        # pinned entries come from precompiled headers, they are never evicted
+        # and the stamps let them be validated without hashing the files
+        for (path, stamp) in stamps.iteritems():
+            if path in entry.deps:
+                self._digests[path] = (tuple(stamp), entry.deps[path])
+        self._pinned[entry.path] = entry
+
+    def _disk_path(self, key):
+        name = '%s:%s:%d:%s:%s' % (key[0], key[1], self.FORMAT, self._target,
+                                   os.pathsep.join(self._include_dirs))
+        return os.path.join(self._dir, hashlib.md5(name).hexdigest() + '.ppc')
+
+    def _load(self, key):
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            fin = open(path, 'rb')
+            variants = cPickle.load(fin)
+            fin.close()
+        except Exception:
+            return None
+        return variants
+
+    def _save(self, key, variants):
+        try:
+            if not os.path.isdir(self._dir):
+                os.makedirs(self._dir)
+            fout = open(self._disk_path(key), 'wb')
+            cPickle.dump(variants, fout, cPickle.HIGHEST_PROTOCOL)
+            fout.close()
+        except (IOError, OSError):
+            pass
+
+    def _is_valid(self, entry):
+        for (name, fp) in entry.lookups.iteritems():
+            if macro_fingerprint(PPMacro.lookup(name)) != fp:
+                return False
+        for (path, digest) in entry.deps.iteritems():
+            try:
+                if self.digest(path) != digest:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def lookup(self, path):
+        entry = self._pinned.get(path, None)
+        if (entry is not None) and self._is_valid(entry):
+            self.hits += 1
+            self.last = entry
+            return entry
+
+        if not self.is_enabled():
+            return None
+
+        key = (path, self.digest(path))
+        variants = self._entries.pop(key, None)
+        if variants is None and self._dir:
+            variants = self._load(key)
+
+        if variants:
+            # put it back as the most recently used
+            self._entries[key] = variants
+            for entry in variants:
+                if self._is_valid(entry):
+                    self.hits += 1
+                    self.last = entry
+                    return entry
+
+        self.misses += 1
+        return None
+
+    def _store(self, entry):
+        key = (entry.path, entry.digest)
+        variants = self._entries.pop(key, [])
+        variants.insert(0, entry)
+        del variants[self.MAX_VARIANTS:]
+        self._entries[key] = variants
+
+        # evict the least recently used files
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+        if self._dir:
+            self._save(key, variants)
+
+    def begin(self, path):
+        entry = PPCacheEntry(path, self.digest(path))
+        self.note_dep(path, entry.digest)
+        self._recorders.append(entry)
+
+    def end(self, tokens):
+        entry = self._recorders.pop()
+        entry.tokens = list(tokens)
+        entry.touched = None
+        if self.is_enabled():
+            self._store(entry)
+        self.last = entry
+        return entry
+
+    def abort(self):
+        self._recorders.pop()
+
+    def note_lookup(self, name, macro):
+        fp = None
+        for r in self._recorders:
+            if (name not in r.touched) and (name not in r.lookups):
+                if fp is None:
+                    fp = macro_fingerprint(macro)
+                r.lookups[name] = fp
+
+    def note_dep(self, path, digest):
+        for r in self._recorders:
+            r.deps[path] = digest
+
+    def note_event(self, event):
+        for r in self._recorders:
+            r.events.append(event)
+            if event[0] in ('define', 'undef'):
+                r.touched.add(event[1])
+
+    def replay(self, entry, target=None):
+        # anything including this file depends on what it depended on
+        for (name, fp) in entry.lookups.iteritems():
+            for r in self._recorders:
+                if (name not in r.touched) and (name not in r.lookups):
+                    r.lookups[name] = fp
+        self.note_dep(entry.path, entry.digest)
+        for (path, digest) in entry.deps.iteritems():
+            self.note_dep(path, digest)
+
+        for event in entry.events:
+            if event[0] == 'define':
+                SymbolTable().new_symbol(event[1], event[2])
+            elif event[0] == 'undef':
+                SymbolTable().del_symbol(event[1])
+            elif event[0] == 'setting':
+                target[event[1]] = event[2]
+            elif event[0] == 'msg':
+                print event[1]
+            self.note_event(event)
+
+        return ('program', list(entry.tokens))
+
+    def __str__(self):
+        return 'PPCache -- Files: %d, Hits: %d, Misses: %d' % \
+               (len(self._entries), self.hits, self.misses)
+
+    __repr__ = __str__
@@ -0,0 +1,278 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import ply.lex as lex
+from session import Session
+from pptoken import TokenFeed
+from ppmacro import PPMacro
+from ppskip import PPSkipper
+
+class PPExpander(object):
+    """
+    Sits between the preprocessor lexer and the preprocessor parser and
+    expands macros in the token stream.  Every token carries a hide set, the
+    names of the macros it came out of, and a macro is never expanded inside
+    its own expansion so recursive macros stop instead of looping.  The
+    replacement is scanned again for other macros, the macro bodies never
+    are since the parameter slots were found when the macro was defined.
+
+    It also follows the conditional blocks.  When a block turns out to be
+    disabled and the source is a lexer, the lexer is moved straight to the
+    #else or #endif that ends it, so the grammar only ever sees a newline
+    for the body of a disabled block.
+    """
+
+    # the rest of the line after these is never expanded
+    DIRECTIVES = ( 'PPDEFINE', 'PPDEFINEF', 'PPUNDEF', 'PPIFDEF', 'PPIFNDEF' )
+
+    CONDITIONALS = ( 'PPIFDEF', 'PPIFNDEF', 'PPELSE', 'PPENDIF' )
+
+    def __init__(self, source):
+        self._source = source
+        self._pending = []
+        self._ready = []
+        self._raw = False
+        self._cond = []
+        self._line = None
+        self._macros = Session().get_macro_table()
+        self._cache = Session().get_pp_cache()
+        self.lineno = 1
+
+    def input(self, data):
+        self._pending = []
+        self._ready = []
+        self._raw = False
+        self._cond = []
+        self._line = None
+        self._source.input(data)
+
+    def _next(self):
+        if len(self._ready):
+            return self._ready.pop()
+        if len(self._pending):
+            return self._pending.pop()
+        return self._source.token()
+
+    def _push(self, toks):
+        self._pending.extend(reversed(toks))
+
+    def token(self):
+        while True:
+            # memoized expansions are final and skip the scan
+            if len(self._ready):
+                return self._ready.pop()
+
+            tok = self._next()
+            if tok is None:
+                return None
+            self.lineno = tok.lineno
+
+            if tok.type == 'NL':
+                self._raw = False
+                if self._line is not None:
+                    self._conditional(self._line)
+                    self._line = None
+                return tok
+            if tok.type in self.CONDITIONALS:
+                self._line = [ tok ]
+            elif self._line is not None:
+                self._line.append(tok)
+            if tok.type in self.DIRECTIVES:
+                self._raw = True
+                return tok
+            if self._raw or (tok.type != 'ID'):
+                return tok
+            if len(self._cond) and not self._cond[-1]:
+                return tok
+
+            hideset = getattr(tok, 'hideset', None)
+            if hideset and (tok.value in hideset):
+                return tok
+
+            (deps, macro, expansion) = self._macros.lookup(tok.value)
+            for (name, stamp, m) in deps:
+                self._cache.note_lookup(name, m)
+            if macro is None:
+                return tok
+
+            if expansion is not None:
+                self._emit(tok, expansion, hideset)
+                continue
+
+            if not macro.is_function():
+                self._replace(tok, macro, macro.expand(), hideset)
+                continue
+
+            call = self._collect_args(tok, macro)
+            if call is None:
+                return tok
+            (args, rparen) = call
+
+            # the arguments are expanded on their own before being spliced in
+            args = [ self._expand_all(arg) for arg in args ]
+            hideset = (hideset or frozenset()) & (getattr(rparen, 'hideset', None) or frozenset())
+            self._replace(tok, macro, macro.expand(args), hideset)
+
+    def _replace(self, tok, macro, value, hideset):
+        if Session().is_debug():
+            print "Replacing %s with %s" % (tok.value, value)
+
+        hideset = (hideset or frozenset()) | frozenset([ macro.name ])
+        out = []
+        for v in value:
+            t = lex.LexToken()
+            t.type = getattr(v, 'type', None) or 'ID'
+            t.value = getattr(v, 'value', v)
+            t.lineno = tok.lineno
+            t.lexpos = tok.lexpos
+            t.hideset = hideset | (getattr(v, 'hideset', None) or frozenset())
+            out.append(t)
+        self._push(out)
+
+    def _conditional(self, line):
+        # the grammar evaluates the directive as well, this only decides
+        # what can be skipped
+        parent = (len(self._cond) == 0) or self._cond[-1]
+        if line[0].type in ('PPIFDEF', 'PPIFNDEF'):
+            active = parent
+            if (len(line) == 2) and (line[1].type == 'ID'):
+                defined = PPMacro.lookup(line[1].value) is not None
+                active = parent and (defined == (line[0].type == 'PPIFDEF'))
+            self._cond.append(active)
+            if parent and not active:
+                self._skip(True)
+        elif line[0].type == 'PPELSE':
+            if len(self._cond) == 0:
+                return
+            parent = (len(self._cond) == 1) or self._cond[-2]
+            self._cond[-1] = parent and not self._cond[-1]
+            if parent and not self._cond[-1]:
+                self._skip(False)
+        elif line[0].type == 'PPENDIF':
+            if len(self._cond):
+                self._cond.pop()
+
+    def _skip(self, stop_at_else):
+        lexer = self._source
+        data = getattr(lexer, 'lexdata', None)
+        if (data is None) or len(self._pending) or len(self._ready):
+            return
+        start = lexer.lexpos
+        end = PPSkipper.skip(data, start, stop_at_else)
+
+        # leave the newline in front of the directive for the block body
+        nl = data.rfind('\n', start, end)
+        if nl >= 0:
+            end = nl
+        lexer.lineno += data.count('\n', start, end)
+        lexer.lexpos = end
+
+    def _emit(self, tok, expansion, hideset):
+        if Session().is_debug():
+            print "Replacing %s with %s" % (tok.value, [ v[1] for v in expansion ])
+
+        hideset = hideset or frozenset()
+        out = []
+        for (type_, value, hs) in expansion:
+            t = lex.LexToken()
+            t.type = type_
+            t.value = value
+            t.lineno = tok.lineno
+            t.lexpos = tok.lexpos
+            t.hideset = hs | hideset
+            out.append(t)
+        out.reverse()
+        self._ready.extend(out)
+
+    def _collect_args(self, tok, macro):
+        # a function-like macro name is only a call when '(' comes next
+        seen = []
+        t = self._next()
+        while (t is not None) and (t.type == 'NL'):
+            seen.append(t)
+            t = self._next()
+        if (t is None) or (t.type != '('):
+            if t is not None:
+                seen.append(t)
+            self._push(seen)
+            return None
+        seen.append(t)
+
+        nparams = len(macro.arglist)
+        args = [ [] ]
+        depth = 0
+        while True:
+            t = self._next()
+            if t is None:
+                print "ERROR: unterminated argument list invoking macro %s in %s, line %s" % \
+                      (macro.name, Session().get_cur_file(), tok.lineno)
+                self._push(seen)
+                return None
+            seen.append(t)
+
+            if t.type == 'NL':
+                # newlines inside the argument list are just whitespace
+                continue
+            if t.type == '(':
+                depth += 1
+            elif t.type == ')':
+                if depth == 0:
+                    break
+                depth -= 1
+            elif (t.type == ',') and (depth == 0) and \
+                 not (macro.variadic and (len(args) == nparams)):
+                args.append([])
+                continue
+            args[-1].append(t)
+
+        # F() passes no arguments, not a single empty one
+        if (nparams == 0) and (args == [ [] ]):
+            args = []
+
+        # the variadic arguments may be left out altogether
+        if macro.variadic and (len(args) == nparams - 1):
+            args.append([])
+
+        if len(args) != nparams:
+            print "ERROR: macro %s expects %d arguments, got %d in %s, line %s" % \
+                  (macro.name, nparams, len(args), Session().get_cur_file(), tok.lineno)
+            self._push(seen)
+            return None
+
+        return (args, t)
+
+    def _expand_all(self, tokens):
+        expander = PPExpander(TokenFeed(tokens))
+        out = []
+        while True:
+            t = expander.token()
+            if t is None:
+                break
+            out.append(t)
+        return out
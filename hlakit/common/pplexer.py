@@ -27,13 +27,16 @@ authors and should not be interpreted as representing official policies, either
 or implied, of David Huseby.
 """
 
+import re
 import copy
 from session import Session
 from symboltable import SymbolTable
+from directivelexer import DirectiveLexer
 
-class PPLexer(object):
+class PPLexer(DirectiveLexer):
 
     tokens      = [ 'PPDEFINE',
+                    'PPDEFINEF',
                     'PPUNDEF',
                     'PPIFDEF',
                     'PPIFNDEF',
@@ -58,33 +61,41 @@ class PPLexer(object):
 
     literals    = '.+-*/~!%><=&^|{}()[]:,'
 
-    # basic conditional compile directives
-    t_PPDEFINE  = r'\#(?i)[\t ]*define'
-    t_PPUNDEF   = r'\#(?i)[\t ]*undef'
-    t_PPIFDEF   = r'\#(?i)[\t ]*ifdef'
-    t_PPIFNDEF  = r'\#(?i)[\t ]*ifndef'
-    t_PPELSE    = r'\#(?i)[\t ]*else'
-    t_PPENDIF   = r'\#(?i)[\t ]*endif'
-
-    # basic include directives
-    t_PPINCLUDE = r'\#(?i)[\t ]*include'
-    t_PPINCBIN  = r'\#(?i)[\t ]*incbin'
-
-    # common messaging directives
-    t_PPTODO    = r'\#(?i)[\t ]*todo'
-    t_PPWARNING = r'\#(?i)[\t ]*warning'
-    t_PPERROR   = r'\#(?i)[\t ]*error'
-    t_PPFATAL   = r'\#(?i)[\t ]*fatal'
+    # the common directives, see DirectiveLexer
+    directives  = { 'define':   'PPDEFINE',
+                    'undef':    'PPUNDEF',
+                    'ifdef':    'PPIFDEF',
+                    'ifndef':   'PPIFNDEF',
+                    'else':     'PPELSE',
+                    'endif':    'PPENDIF',
+                    'include':  'PPINCLUDE',
+                    'incbin':   'PPINCBIN',
+                    'todo':     'PPTODO',
+                    'warning':  'PPWARNING',
+                    'error':    'PPERROR',
+                    'fatal':    'PPFATAL' }
 
     t_HASH      = r'\#'
     t_STRING    = r'\"(\\.|[^\"])*\"'
     t_BSTRING   = r'\<(\\.|[^\>])*\>'
     t_DECIMAL   = r'\b(0|[1-9][0-9]*)\b'
     t_KILO      = r'\b(0|[1-9][0-9]*)[kK]\b'
-    t_HEXC      = r'0x[0-9a-fA-F]+'
+    t_HEXC      = r'0[xX][0-9a-fA-F]+'
     t_HEXS      = r'\$[0-9a-fA-F]+'
     t_BINARY    = r'%[01]+'
 
+    # the name of a function-like macro is followed right away by a '('
+    _macro_function = re.compile(r'[\t ]+[a-zA-Z_][\w]*\(')
+
+    def directive(self, t):
+        if t.type == 'PPDEFINE':
+            m = self._macro_function.match(t.lexer.lexdata, t.lexer.lexpos)
+            if m is not None:
+                t.type = 'PPDEFINEF'
+                t.value += m.group()
+                t.lexer.lexpos = m.end()
+        return t
+
     def t_PPCONT(self, t):
         r'\\[\t\r ]*\n'
         t.lexer.lineno += t.value.count('\n')
@@ -106,6 +117,9 @@ class PPLexer(object):
 
     def t_ID(self, t):
         r'[a-zA-Z_][\w]*'
+        # identifiers are interned so comparing them and looking them up in
+        # the macro table is a pointer compare
+        t.value = intern(t.value)
         return t
 
     def t_error(self, t):
@@ -27,6 +27,8 @@ authors and should not be interpreted as representing official policies, either
 or implied, of David Huseby.
 """
 
+from symboltable import SymbolTable
+
 # ------------------------------------------------------------------
 # Macro object
 #
@@ -37,6 +39,7 @@ or implied, of David Huseby.
 #    .arglist   - List of argument names
 #    .variadic  - Boolean indicating whether or not variadic macro
 #    .vararg    - Name of the variadic parameter
+#    .patches   - List of (position, argument index) pairs
 #
 # When a macro is created, the macro replacement token sequence is
 # pre-scanned and used to create patch lists that are later used
@@ -44,6 +47,10 @@ or implied, of David Huseby.
 # ------------------------------------------------------------------
 
 class PPMacro(object):
+
+    # the parameter name that '...' binds to
+    VARARG = '__VA_ARGS__'
+
     def __init__(self, name, value, arglist=None, variadic=False):
         self.name = name
         self.value = value
@@ -52,6 +59,47 @@ class PPMacro(object):
         if variadic:
             self.vararg = arglist[-1]
 
+        # note where each parameter appears in the replacement so that
+        # expanding is just splicing the arguments into those slots
+        self.patches = []
+        if arglist:
+            slots = dict([ (a, i) for (i, a) in enumerate(arglist) ])
+            for (pos, tok) in enumerate(value or []):
+                if getattr(tok, 'type', 'ID') != 'ID':
+                    continue
+                i = slots.get(getattr(tok, 'value', tok))
+                if i is not None:
+                    self.patches.append((pos, i))
+
+    @staticmethod
+    def lookup(name):
+        # the symbol table also holds compiler symbols, only macros count
+        macro = SymbolTable().lookup_symbol(name)
+        if isinstance(macro, PPMacro):
+            return macro
+        return None
+
+    def is_function(self):
+        return self.arglist is not None
+
+    def expand(self, args=[]):
+        """
+        Returns the replacement tokens with the argument token lists spliced
+        into the parameter slots found when the macro was defined.
+        """
+        value = self.value or []
+        if len(self.patches) == 0:
+            return list(value)
+
+        out = []
+        last = 0
+        for (pos, i) in self.patches:
+            out.extend(value[last:pos])
+            out.extend(args[i])
+            last = pos + 1
+        out.extend(value[last:])
+        return out
+
     def __str__(self):
         if self.arglist is None:
             return '%s => %s' % (self.name, self.value)
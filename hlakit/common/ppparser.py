@@ -30,37 +30,162 @@ or implied, of David Huseby.
 from session import Session
 from symboltable import SymbolTable
 from ppmacro import PPMacro
+from pptoken import PPToken, TokenFeed
+from linetable import LineTable
+from ppexpander import PPExpander
+from ppskip import PPSkipper
 from buffer import Buffer
 
 class PPParser(object):
 
+    # the most tokens the streaming preprocessor parses in one go
+    STREAM_BATCH = 512
+
+    # directives that the streaming preprocessor evaluates itself
+    CONDITIONALS = ( 'PPIFDEF', 'PPIFNDEF', 'PPELSE', 'PPENDIF' )
+
     def __init__(self, tokens=[]):
         self.tokens = tokens
         self._enabled = [ True ]
         self._depth = 0
+        self._fid = 0
+        self._stream = False
+        self._line = (None, None, 0)
 
     def is_enabled(self):
         return self._enabled[-1]
 
+    def save_state(self, fname=None, stream=False, parent=0):
+        # called before parsing an included file, the include gets a fresh
+        # conditional stack so an unbalanced #if in it can't leak out, parent
+        # is the position of the #include
+        state = (self._enabled, self._depth, self._fid, self._stream)
+        self._enabled = [ True ]
+        self._depth += 1
+        self._fid = 0
+        if fname is not None:
+            self._fid = LineTable().add_file(fname, parent)
+        self._stream = stream
+        self._line = (None, None, 0)
+        return state
+
+    def restore_state(self, state):
+        if len(self._enabled) > 1:
+            print "ERROR: unterminated conditional block in %s" % Session().get_cur_file()
+        (self._enabled, self._depth, self._fid, self._stream) = state
+        self._line = (None, None, 0)
+
+    def stream(self, parser, lexer, data, debug=False):
+        """
+        Generator that preprocesses data a few lines at a time and yields the
+        output tokens as it goes, so only the current batch of lines is ever
+        held in memory.  The conditional directives are evaluated here, every
+        other line goes through the grammar.  An #include yields a PPINCLUDE
+        token holding the resolved path and the batch ends right after it so
+        the caller can preprocess the included file before any later line.
+        """
+        lexer.input(data)
+        batch = []
+        line = []
+        flush = False
+        parens = 0
+        while True:
+            tok = lexer.token()
+            if tok is None:
+                break
+            if (len(line) == 0) and (tok.type != 'NL'):
+                # a new line starts here, parse what has been gathered so far
+                # if it can't run on into this line
+                if flush or (tok.type in self.CONDITIONALS) or \
+                   ((len(batch) >= self.STREAM_BATCH) and (parens == 0)):
+                    for t in self._parse_batch(parser, batch, debug):
+                        yield t
+                    batch = []
+                    flush = False
+            line.append(tok)
+            if tok.type != 'NL':
+                # macro arguments may run over several lines
+                if tok.type == '(':
+                    parens += 1
+                elif (tok.type == ')') and (parens > 0):
+                    parens -= 1
+                continue
+
+            if line[0].type in self.CONDITIONALS:
+                if self._conditional(line):
+                    # jump over the disabled lines without lexing them
+                    pos = lexer.lexpos
+                    end = PPSkipper.skip(lexer.lexdata, pos, line[0].type != 'PPELSE')
+                    lexer.lineno += lexer.lexdata.count('\n', pos, end)
+                    lexer.lexpos = end
+            else:
+                batch.extend(line)
+                flush = (line[0].type == 'PPINCLUDE')
+            line = []
+
+        batch.extend(line)
+        for t in self._parse_batch(parser, batch, debug):
+            yield t
+
+    def expander(self, lexer):
+        # macros are expanded on the tokens before they reach the grammar
+        return PPExpander(lexer)
+
+    def _parse_batch(self, parser, batch, debug=False):
+        if len(batch) == 0:
+            return []
+        result = parser.parse(lexer=self.expander(TokenFeed(batch)), debug=debug)
+        if result is None:
+            return []
+        return result[1]
+
+    def _conditional(self, line):
+        # returns True when the lines that follow are disabled
+        if (line[0].type in ('PPIFDEF', 'PPIFNDEF')) and (len(line) == 3) and \
+           (line[1].type == 'ID'):
+            self._block_start(line[0].type == 'PPIFDEF', line[1].value)
+        elif (line[0].type == 'PPELSE') and (len(line) == 2):
+            self._block_else()
+        elif (line[0].type == 'PPENDIF') and (len(line) == 2):
+            self._block_end()
+            return False
+        else:
+            print "Syntax error in input! File: %s, Line: %s" % (Session().get_cur_file(), line[0].lineno)
+            return False
+        return (len(self._enabled) > 1) and self._enabled[-2] and not self._enabled[-1]
+
+    def _token(self, p, n):
+        # turn a terminal into an output token that keeps its type and position
+        return PPToken(p[n], p.slice[n].type, self._position(p.lineno(n)))
+
+    def _position(self, line):
+        # the tokens of a line share one position
+        if (self._line[0] == self._fid) and (self._line[1] == line):
+            return self._line[2]
+        pos = LineTable().position(self._fid, line)
+        self._line = (self._fid, line, pos)
+        return pos
+
     def p_program(self, p):
         '''program : common_statement
                    | program common_statement'''
+        # the token list is built in place so it grows in amortized
+        # constant time instead of being copied on every reduction
         if len(p) == 2:
             if p[1] is None:
                 p[0] = ('program', [])
             else:
                 if isinstance(p[1], list):
-                    p[0] = ('program', p[1])
+                    p[0] = ('program', list(p[1]))
                 else:
                     p[0] = ('program', [ p[1] ])
         elif len(p) == 3:
-            if p[2] is None:
-                p[0] = ('program', p[1][1])
-            else:
+            p[0] = p[1]
+            if p[2] is not None:
                 if isinstance(p[2], list):
-                    p[0] = ('program', p[1][1] + p[2])
+                    p[0][1].extend(p[2])
                 else:
-                    p[0] = ('program', p[1][1] + [ p[2] ])
+                    p[0][1].append(p[2])
 
     def p_common_statement(self, p):
         '''common_statement : pp_block_statement
@@ -92,13 +217,19 @@ class PPParser(object):
         '''pp_block_start : PPIFDEF ID NL
                           | PPIFNDEF ID NL '''
 
+        self._block_start(p.slice[1].type == 'PPIFDEF', p[2])
+        p[0] = ('pp_block_start', p[1], p[2])
+
+    def _block_start(self, ifdef, name):
         # only execute the logic if we're enabled
         if self.is_enabled():
             # check to see if the symbol is defined
-            defined = (SymbolTable().lookup_symbol(p[2]) != None)
+            macro = PPMacro.lookup(name)
+            Session().get_pp_cache().note_lookup(name, macro)
+            defined = (macro != None)
 
             # execute the ifdef/ifndef logic
-            if ((defined == False) and (p[1] == '#ifdef')) or (defined and (p[1] == '#ifndef')):
+            if defined != ifdef:
                 self._enabled.append(False)
             else:
                 self._enabled.append(True)
@@ -106,14 +237,15 @@ class PPParser(object):
             # we're disabled so push a False to track depth while keeping disabled state
             self._enabled.append(False)
 
-        p[0] = ('pp_block_start', p[1], p[2])
-
     def p_pp_block_else(self, p):
         '''pp_block_else : PPELSE NL '''
+        if self._block_else():
+            p[0] = ('pp_block_else', p[1])
 
+    def _block_else(self):
         if len(self._enabled) == 1:
             print "ERROR: unmatched #else"
-            return
+            return False
 
         # remove the top item in the list
         old_state = self._enabled.pop()
@@ -125,20 +257,21 @@ class PPParser(object):
         else:
             # we're disabled so push a False to track depth while keeping disabled state
             self._enabled.append(False)
-
-        p[0] = ('pp_block_else', p[1])
+        return True
 
     def p_pp_block_end(self, p):
         '''pp_block_end : PPENDIF NL '''
+        if self._block_end():
+            p[0] = ('pp_block_end', p[1])
 
+    def _block_end(self):
         if len(self._enabled) == 1:
             print "ERROR: unmatched #endif"
-            return
+            return False
 
         # pop the current state off of the stack
         self._enabled.pop()
-
-        p[0] = ('pp_block_end', p[1])
+        return True
 
     def p_pp_block_body(self, p):
         '''pp_block_body : common_statement
@@ -150,17 +283,19 @@ class PPParser(object):
                     p[0] = []
                     return
                 if isinstance(p[1], list):
-                    p[0] = p[1]
+                    p[0] = list(p[1])
                 else:
                     p[0] = [ p[1] ]
             elif len(p) == 3:
+                p[0] = p[1]
                 if p[2] is None:
-                    p[0] = p[1]
                     return
+                if p[0] is None:
+                    p[0] = []
                 if isinstance(p[2], list):
-                    p[0] = p[1] + p[2]
+                    p[0].extend(p[2])
                 else:
-                    p[0] = p[1] + [ p[2] ]
+                    p[0].append(p[2])
 
     def p_pp_statement(self, p):
         '''pp_statement : pp_include NL
@@ -173,40 +308,45 @@ class PPParser(object):
     def p_pp_define(self, p):
         '''pp_define : PPDEFINE ID empty
                      | PPDEFINE ID pp_define_body
-                     | PPDEFINE ID '(' pp_define_params ')' pp_define_body'''
+                     | PPDEFINEF ')' empty
+                     | PPDEFINEF ')' pp_define_body
+                     | PPDEFINEF pp_define_params ')' empty
+                     | PPDEFINEF pp_define_params ')' pp_define_body'''
 
-        name = p[2]
-        value = []
+        value = p[len(p) - 1]
         params = None
 
-        if len(p) == 4:
-            value = p[3]
-        elif len(p) == 7:
-            value = p[6]
-            params = p[4]
-
-        SymbolTable().new_symbol( name, PPMacro(name, value, params) )
+        if p.slice[1].type == 'PPDEFINE':
+            name = p[2]
+        else:
+            # the lexer only matches '#define NAME(' when the '(' follows the
+            # name right away, so '#define NAME (x)' stays an object-like macro
+            name = p[1][:-1].split()[-1]
+            params = []
+            if len(p) == 5:
+                params = p[2]
+
+        variadic = bool(params) and (params[-1] == PPMacro.VARARG)
+        macro = PPMacro(name, value, params, variadic)
+        SymbolTable().new_symbol( name, macro )
+        Session().get_pp_cache().note_event( ('define', name, macro) )
 
     def p_pp_define_params(self, p):
-        '''pp_define_params : ID
-                            | pp_define_params ',' ID'''
+        '''pp_define_params : pp_define_param
+                            | pp_define_params ',' pp_define_param'''
+        if len(p) == 2:
+            p[0] = [ p[1] ]
+        else:
+            p[0] = p[1]
+            p[0].append(p[3])
 
+    def p_pp_define_param(self, p):
+        '''pp_define_param : ID
+                           | '.' '.' '.' '''
         if len(p) == 2:
-            if p[1] is None:
-                p[0] = []
-                return
-            if isinstance(p[1], list):
-                p[0] = p[1]
-            else:
-                p[0] = [ p[1] ]
-        elif len(p) == 4:
-            if p[3] is None:
-                p[0] = p[1]
-                return
-            if isinstance(p[3], list):
-                p = p[1] + p[3]
-            else:
-                p[0] = p[1] + [ p[3] ]
+            p[0] = p[1]
+        else:
+            p[0] = PPMacro.VARARG
 
     def p_pp_define_body(self, p):
         '''pp_define_body : pp_block_statement
@@ -222,17 +362,17 @@ class PPParser(object):
                 p[0] = []
                 return
             if isinstance(p[1], list):
-                p[0] = p[1]
+                p[0] = list(p[1])
             else:
                 p[0] = [ p[1] ]
         elif len(p) == 3:
+            p[0] = p[1]
             if p[2] is None:
-                p[0] = p[1]
                 return
             if isinstance(p[2], list):
-                p[0] = p[1] + p[2]
+                p[0].extend(p[2])
             else:
-                p[0] = p[1] + [ p[2] ]
+                p[0].append(p[2])
 
     def p_pp_define_body_token(self, p):
         '''pp_define_body_token : number
@@ -261,24 +401,41 @@ class PPParser(object):
                                 | ']'
                                 | ':'
                                 | ',' '''
-        p[0] = p[1]
+        if p.slice[1].type == 'number':
+            p[0] = p[1]
+        else:
+            p[0] = self._token(p, 1)
 
     def p_pp_undef(self, p):
         '''pp_undef : PPUNDEF ID'''
         SymbolTable().del_symbol(p[2])
+        Session().get_pp_cache().note_event( ('undef', p[2]) )
 
     def p_pp_include(self, p):
         '''pp_include : PPINCLUDE filename'''
 
+        # don't bother opening files that are in a disabled block
+        if not self.is_enabled():
+            return
+
         # resolve the file name path
         #print "Including %s from: %s, line: %s" % (p[2][1:-1], Session().get_cur_file(), p.lexer.lineno)
-        fpath = Session().get_file_path(p[2][1:-1], (p[2][0] == '<'))
+        name = p[2].value
+        fpath = Session().get_file_path(name[1:-1], (name[0] == '<'))
 
         if fpath is None:
             import pdb; pdb.set_trace()
 
+        # the include tree is rooted at the position of the #include
+        inc = PPToken(fpath, 'PPINCLUDE', self._position(p.lineno(1)))
+
+        # when streaming, the caller preprocesses the file
+        if self._stream:
+            p[0] = [ inc ]
+            return
+
         # get the program ast for the included file
-        prg = Session().preprocess_file(fpath)
+        prg = Session().preprocess_file(inc)
  
         if p is None or prg is None:
             import pdb; pdb.set_trace()
@@ -292,15 +449,29 @@ class PPParser(object):
                   | PPFATAL STRING'''
         msg = '%s: %s' % (p[1].upper(), p[2])
         print msg
+        Session().get_pp_cache().note_event( ('msg', msg) )
 
     def p_pp_incbin(self, p):
         '''pp_incbin : PPINCBIN filename'''
 
+        # binaries in a disabled block are not dependencies
+        if not self.is_enabled():
+            return
+
         # resolve the file name path
-        fpath = Session().get_file_path(p[2][1:-1], (p[2][0] == '<'))
+        name = p[2].value
+        fpath = Session().get_file_path(name[1:-1], (name[0] == '<'))
         #print 'INCLUDING BINARY: %s' % fpath
+        if fpath is None:
+            raise IOError('file not found: %s' % name[1:-1])
+        Session().note_dependency(fpath)
+        Session().get_pp_cache().note_event( ('incbin', fpath) )
 
-        p[0] = [ '#', 'incbin', '"' + fpath + '"', '\n' ]
+        pos = self._position(p.lineno(1))
+        p[0] = [ PPToken('#', 'HASH', pos),
+                 PPToken('incbin', 'ID', pos),
+                 PPToken('"' + fpath + '"', 'STRING', pos),
+                 PPToken('\n', 'NL', pos) ]
 
     def p_base_statement(self, p):
         '''base_statement : base_token
@@ -310,17 +481,17 @@ class PPParser(object):
                 p[0] = []
                 return
             if isinstance(p[1], list):
-                p[0] = p[1]
+                p[0] = list(p[1])
             else:
                 p[0] = [ p[1] ]
         elif len(p) == 3:
+            p[0] = p[1]
             if p[2] is None:
-                p[0] = p[1]
                 return
             if isinstance(p[2], list):
-                p[0] = p[1] + p[2]
+                p[0].extend(p[2])
             else:
-                p[0] = p[1] + [ p[2] ]
+                p[0].append(p[2])
 
     def p_number(self, p):
         '''number : DECIMAL
@@ -328,12 +499,12 @@ class PPParser(object):
                   | HEXC
                   | HEXS
                   | BINARY'''
-        p[0] = p[1]
+        p[0] = self._token(p, 1)
 
     def p_filename(self, p):
         '''filename : STRING
                     | BSTRING'''
-        p[0] = p[1]
+        p[0] = self._token(p, 1)
 
     def p_base_token(self, p):
         '''base_token     : number
@@ -363,17 +534,15 @@ class PPParser(object):
                           | ']'
                           | ':'
                           | ',' '''
-        p[0] = p[1]
+        if p.slice[1].type in ('number', 'id'):
+            p[0] = p[1]
+        else:
+            p[0] = self._token(p, 1)
 
     def p_id(self, p):
         '''id : ID'''
-        macro = SymbolTable().lookup_symbol(p[1])
-        if macro:
-            print "Replacing %s with %s" % (p[1], macro.value)
-            p[0] = macro.value
-            return
-
-        p[0] = p[1]
+        # macros were already expanded by the PPExpander
+        p[0] = self._token(p, 1)
 
     def p_empty(self, p):
         '''empty : '''
@@ -0,0 +1,90 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import re
+from pplexer import PPLexer
+
+class PPSkipper(object):
+    """
+    Finds the end of a disabled conditional block in the raw text so the
+    preprocessor can jump over it instead of lexing and parsing every token
+    just to throw the result away.  Only the lines starting with #ifdef,
+    #ifndef, #else and #endif matter, comments and strings are stepped over
+    so a directive inside them is not mistaken for a real one.
+    """
+
+    # every alternative starts with a fixed character so the regex engine can
+    # jump between candidates instead of trying each position, the directive
+    # name is taken the same way DirectiveLexer takes it
+    SCAN = re.compile(r'\n[\t ]*\#[\t ]*([a-zA-Z_][\w]*(?:[\t ]*\.[\t ]*[a-zA-Z_][\w]*)*)|'
+                      r'/\*|//[^\n]*|"(\\.|[^"\\\n])*"')
+    COMMENT_END = re.compile(r'\*/')
+
+    @staticmethod
+    def skip(data, pos, stop_at_else=True):
+        """
+        Returns the position of the start of the line holding the #else or
+        #endif that ends the block starting at pos, or the end of the data
+        if the block is never closed.
+        """
+        # the directive pattern starts with the newline ending the line before
+        # so a block starting at the very beginning needs one in front
+        shift = 0
+        if pos == 0:
+            data = '\n' + data
+            shift = 1
+        else:
+            pos -= 1
+
+        depth = 0
+        while True:
+            m = PPSkipper.SCAN.search(data, pos)
+            if m is None:
+                return len(data) - shift
+            pos = m.end()
+
+            directive = m.group(1)
+            if directive is None:
+                if m.group(0) == '/*':
+                    end = PPSkipper.COMMENT_END.search(data, pos)
+                    if end is None:
+                        return len(data) - shift
+                    pos = end.end()
+                continue
+
+            # look the whole name up like the lexer does, '#endifx' is no #endif
+            type_ = PPLexer.directives.get(''.join(directive.split()).lower(), None)
+            if type_ in ('PPIFDEF', 'PPIFNDEF'):
+                depth += 1
+            elif type_ == 'PPENDIF':
+                if depth == 0:
+                    return m.start() + 1 - shift
+                depth -= 1
+            elif (type_ == 'PPELSE') and stop_at_else and (depth == 0):
+                return m.start() + 1 - shift
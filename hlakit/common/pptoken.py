@@ -0,0 +1,92 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+from linetable import LineTable
+
+class PPToken(object):
+    """
+    A token in the preprocessor output.  It keeps the token text, the token
+    type from the preprocessor lexer and the position it came from so the
+    compiler can take the tokens without lexing them again.  A unit holds a
+    lot of these so they are slotted, the text of an identifier is interned
+    and the file and line are packed into the position, they are looked up
+    in the LineTable only when they are asked for.
+    """
+
+    __slots__ = ('value', 'type', 'pos')
+
+    def __init__(self, value, type_=None, pos=0):
+        self.value = value
+        self.type = type_
+        self.pos = pos
+
+    @property
+    def fname(self):
+        return LineTable().get_location(self.pos)[0]
+
+    @property
+    def lineno(self):
+        return LineTable().resolve(self.pos)[1]
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return 'PPToken(%r, %r)' % (self.value, self.type)
+
+    def __reduce__(self):
+        # positions only mean something to the line table that handed them
+        # out, so a pickled token carries its file and line instead
+        (fname, lineno) = LineTable().get_location(self.pos)
+        return (_located_token, (self.value, self.type, fname, lineno))
+
+def _located_token(value, type_, fname, lineno):
+    pos = 0
+    if fname is not None:
+        pos = LineTable().locate(fname, lineno)
+    if type_ == 'ID':
+        value = intern(value)
+    return PPToken(value, type_, pos)
+
+class TokenFeed(object):
+    """
+    Hands an already lexed list of tokens to the parser.
+    """
+
+    def __init__(self, tokens):
+        self._next = iter(tokens).next
+        self.lineno = 1
+
+    def token(self):
+        try:
+            tok = self._next()
+        except StopIteration:
+            return None
+        self.lineno = tok.lineno
+        return tok
@@ -0,0 +1,167 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import struct
+import marshal
+from ppmacro import PPMacro
+from pptoken import PPToken
+from linetable import LineTable
+from ppcache import PPCacheEntry
+
+class PrecompiledHeaderError(Exception):
+    def __init__(self, value):
+        self.value = value
+    def __str__(self):
+        return str(self.value)
+
+class PrecompiledHeader(object):
+    """
+    Reads and writes .hpch files.  A precompiled header is the recorded
+    preprocessor result of a header (see PPCacheEntry): the output tokens,
+    the macro definitions and other side effects, the incoming macros the
+    header tested and the digest, size and mtime of every file it came from.
+
+    The file is the magic, a format version and a marshalled dict so that it
+    loads with a single read and no pickling of classes.  Token lists are
+    stored as parallel lists of text, type, file index and line.
+    """
+
+    MAGIC = 'HPCH'
+    VERSION = 2
+
+    @staticmethod
+    def _pack_tokens(tokens, files):
+        # marshal only knows plain strings, so the token types and positions
+        # are stored in parallel lists with the file names in a shared table
+        table = LineTable()
+        values = []
+        types = []
+        fids = []
+        lines = []
+        for t in tokens:
+            (fname, line) = table.get_location(getattr(t, 'pos', 0))
+            if fname not in files:
+                files[fname] = len(files)
+            values.append(str(t))
+            types.append(getattr(t, 'type', None))
+            fids.append(files[fname])
+            lines.append(line)
+        return (values, types, fids, lines)
+
+    @staticmethod
+    def _unpack_tokens(packed, files):
+        (values, types, fids, lines) = packed
+        table = LineTable()
+        ids = [ (f is not None) and table.get_file_id(f) for f in files ]
+        tokens = []
+        for i in xrange(len(values)):
+            pos = 0
+            if ids[fids[i]]:
+                pos = table.position(ids[fids[i]], lines[i])
+            tokens.append(PPToken(values[i], types[i], pos))
+        return tokens
+
+    @staticmethod
+    def _pack_event(event, files):
+        # macros are stored as plain tuples
+        if event[0] == 'define':
+            m = event[2]
+            value = m.value
+            if value is not None:
+                value = PrecompiledHeader._pack_tokens(value, files)
+            return ('define', m.name, value, m.arglist, m.variadic)
+        return event
+
+    @staticmethod
+    def _unpack_event(event, files):
+        if event[0] == 'define':
+            value = event[2]
+            if value is not None:
+                value = PrecompiledHeader._unpack_tokens(value, files)
+            return ('define', event[1], PPMacro(event[1], value, event[3], event[4]))
+        return event
+
+    @staticmethod
+    def save(fpath, entry, target):
+        stamps = {}
+        for path in entry.deps.iterkeys():
+            st = os.stat(path)
+            stamps[path] = (st.st_mtime, st.st_size)
+
+        files = {}
+        tokens = PrecompiledHeader._pack_tokens(entry.tokens, files)
+        events = [ PrecompiledHeader._pack_event(e, files) for e in entry.events ]
+        file_table = [ None ] * len(files)
+        for (fname, fid) in files.iteritems():
+            file_table[fid] = fname
+
+        payload = { 'target':   target,
+                    'path':     entry.path,
+                    'digest':   entry.digest,
+                    'files':    file_table,
+                    'tokens':   tokens,
+                    'events':   events,
+                    'lookups':  entry.lookups,
+                    'deps':     entry.deps,
+                    'guard':    entry.guard,
+                    'stamps':   stamps }
+
+        fout = open(fpath, 'wb')
+        fout.write(PrecompiledHeader.MAGIC)
+        fout.write(struct.pack('<H', PrecompiledHeader.VERSION))
+        fout.write(marshal.dumps(payload, 2))
+        fout.close()
+
+    @staticmethod
+    def load(fpath, target):
+        fin = open(fpath, 'rb')
+        data = fin.read()
+        fin.close()
+
+        hdr = len(PrecompiledHeader.MAGIC)
+        if data[:hdr] != PrecompiledHeader.MAGIC:
+            raise PrecompiledHeaderError('%s is not a precompiled header' % fpath)
+        version = struct.unpack('<H', data[hdr:hdr + 2])[0]
+        if version != PrecompiledHeader.VERSION:
+            raise PrecompiledHeaderError('%s has unsupported version %d' % (fpath, version))
+
+        payload = marshal.loads(data[hdr + 2:])
+        if payload['target'] != target:
+            raise PrecompiledHeaderError('%s was precompiled for %s' % (fpath, payload['target']))
+
+        entry = PPCacheEntry(payload['path'], payload['digest'])
+        files = payload['files']
+        entry.tokens = PrecompiledHeader._unpack_tokens(payload['tokens'], files)
+        entry.events = [ PrecompiledHeader._unpack_event(e, files) for e in payload['events'] ]
+        entry.lookups = payload['lookups']
+        entry.deps = payload['deps']
+        entry.guard = payload.get('guard', None)
+        entry.touched = None
+        return (entry, payload['stamps'])
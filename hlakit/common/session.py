@@ -29,12 +29,26 @@ or implied, of David Huseby.
 
 import os
 import sys
+import copy
+import shlex
 import optparse
+import multiprocessing
 import cStringIO
-import ply.lex as lex
-import ply.yacc as yacc
 from ppgraph import PPGraph
+from tablecache import TableCache
+from ppcache import PPCache
+from includeguard import IncludeGuards
+from includeresolver import IncludeResolver
+from tokenstream import TokenStream
+from precompiledheader import PrecompiledHeader, PrecompiledHeaderError
+from ppmacro import PPMacro
+from macrotable import MacroTable
+from depfile import DepFile
+from incbin import IncBin
+from linetable import LineTable
+from compilecontext import CompileContext, ContextState
 from hlakit.common.symboltable import SymbolTable
+from hlakit.common.types import Types
 
 HLAKIT_VERSION = "0.8"
 
@@ -47,7 +61,7 @@ class CommandLineError(Exception):
 class DummyOptions(object):
     pass
 
-class Session(object):
+class Session(ContextState):
     """
     This encapsulates the global configuration of a given session using hlakit.
     It handles parsing the command line parameters and providing an interface
@@ -124,12 +138,18 @@ class Session(object):
         #}
     }
 
-    _shared_state = {}
+    # the file name given to macros defined on the command line
+    COMMAND_LINE = '<command line>'
 
-    def __new__(cls, *a, **k):
-        obj = object.__new__(cls, *a, **k)
-        obj.__dict__ = cls._shared_state
-        return obj
+    # the gcc style spellings of the make dependency switches
+    DEP_OPTIONS = {
+        '-MD': '--MD',
+        '-MF': '--MF',
+        '-MT': '--MT',
+        '-MP': '--MP'
+    }
+
+    _state_name = 'session'
 
     def _build_parser(self):
         self._parser = None
@@ -147,10 +167,57 @@ class Session(object):
                  'directives and implies the cpu so you don\'t have to specify the cpu.')
         parser.add_option('-I', '--include', action="append", default=[], dest='include',
             help='specify directories to search for include files')
+        parser.add_option('-D', '--define', action='callback', callback=_macro_option,
+            callback_args=('define',), type='string', default=[], dest='macros',
+            metavar='NAME[=VALUE]',
+            help='define a macro before preprocessing as if by #define, the value\n'
+                 'defaults to 1')
+        parser.add_option('-U', '--undefine', action='callback', callback=_macro_option,
+            callback_args=('undef',), type='string', dest='macros', metavar='NAME',
+            help='undefine a macro defined earlier on the command line')
+        parser.add_option('--variants', default=None, dest='variants',
+            help='build every variant listed in the given file, each line is a\n'
+                 'variant name, a colon and the -D and -U switches it adds')
         parser.add_option('-g', '--debug', action='store_true', dest='debug', default=False,
             help='outputs some debug output')
         parser.add_option('-d', '--draw_graph', action='store_true', dest='graph', default=False,
             help='outputs a graph of the ast')
+        parser.add_option('--table-dir', default=None, dest='table_dir',
+            help='specify the directory used to cache the generated lexer and parser\n'
+                 'tables (default: %s)' % TableCache.DEFAULT_ROOT)
+        parser.add_option('--rebuild-tables', action='store_true', dest='rebuild_tables', default=False,
+            help='regenerate the cached lexer and parser tables')
+        parser.add_option('--pp-cache-size', type='int', default=256, dest='pp_cache_size',
+            help='the number of preprocessed files to keep in memory, 0 turns off\n'
+                 'the preprocessor cache')
+        parser.add_option('--pp-cache-dir', default=None, dest='pp_cache_dir',
+            help='specify a directory to store preprocessed files in between runs')
+        parser.add_option('--precompile', action='store_true', dest='precompile', default=False,
+            help='preprocess the given header and save it as a precompiled header')
+        parser.add_option('--pch', action='append', default=[], dest='pch',
+            help='use the given precompiled header whenever its header is included')
+        parser.add_option('--direct-tokens', action='store_true', dest='direct_tokens', default=False,
+            help='hand the preprocessor tokens straight to the compiler instead of\n'
+                 'turning them back into text and lexing them again')
+        parser.add_option('--stream', action='store_true', dest='stream', default=False,
+            help='feed the preprocessor tokens to the compiler as they are produced\n'
+                 'instead of preprocessing whole files up front, implies --direct-tokens')
+        parser.add_option('-o', '--output', default=None, dest='output',
+            help='specify the output file')
+        parser.add_option('-j', '--jobs', type='int', default=1, dest='jobs',
+            help='compile up to this many files at once, each in its own process')
+        parser.add_option('--MD', action='store_true', dest='dep_file_md', default=False,
+            help='write a make rule listing every file read while preprocessing,\n'
+                 'also accepted as -MD')
+        parser.add_option('--MF', default=None, dest='dep_file',
+            help='specify the file the make rule is written to, implies --MD\n'
+                 '(default: the target name plus .d), also accepted as -MF')
+        parser.add_option('--MT', default=None, dest='dep_target',
+            help='specify the target of the make rule (default: the output file or\n'
+                 'the first source file without its extension), also accepted as -MT')
+        parser.add_option('--MP', action='store_true', dest='dep_phony', default=False,
+            help='add an empty rule for every included file so make doesn\'t fail when\n'
+                 'one is deleted, also accepted as -MP')
 
         self._opts_parser = parser
 
@@ -159,6 +226,10 @@ class Session(object):
         self._args = None
         self._target = None
 
+        # optparse only has single letter short options, so the make
+        # dependency switches are spelled with two dashes internally
+        args = [ self.DEP_OPTIONS.get(a, a) for a in args ]
+
         # actually parse the args
         (self._options, self._args) = self.get_opts_parser().parse_args(args)
        
@@ -197,6 +268,42 @@ class Session(object):
         # initialize the target
         self._target = platform_ctor(self._options.cpu.lower())
 
+        # each target caches its tables in its own directory
+        target_name = platform_class
+        if platform == 'generic':
+            target_name += '_' + self._options.cpu.lower()
+        self._target_name = target_name
+        self._table_cache = TableCache(target_name,
+                                       self._options.table_dir,
+                                       self._options.rebuild_tables)
+
+        # token positions are only good for the session that made them
+        LineTable().reset_state()
+
+        # the pooled preprocessor objects belong to the old target
+        self._pp_parser_obj = None
+        self._pp_lexers = []
+        self._pp_cache = PPCache(self._options.pp_cache_size, self._options.pp_cache_dir,
+                                 target_name, self.get_include_dirs())
+        self._include_guards = IncludeGuards()
+        self._macro_table = MacroTable()
+        self._depfile = DepFile()
+        self._incbins = {}
+        self._include_resolver = IncludeResolver(self.get_include_dirs())
+
+        # load the precompiled headers
+        for pch in self._options.pch:
+            try:
+                (entry, stamps) = PrecompiledHeader.load(pch, target_name)
+            except (IOError, PrecompiledHeaderError), e:
+                print >> sys.stderr, 'WARNING: ignoring precompiled header: %s' % e
+                continue
+            self._pp_cache.pin(entry, stamps)
+
+        # seed the macros given on the command line
+        self._macros = self.get_macros()
+        self.define_macros(self._macros)
+
     def parse_args(self, args=[]):
         try:
             self._build_parser()
@@ -231,6 +338,142 @@ class Session(object):
         if getattr(self, '_options', None):
             return self._options.graph
 
+    def is_precompile(self):
+        if getattr(self, '_options', None):
+            return self._options.precompile
+
+    def is_direct_tokens(self):
+        if getattr(self, '_options', None):
+            return self._options.direct_tokens
+
+    def is_stream(self):
+        if getattr(self, '_options', None):
+            return self._options.stream
+
+    def get_macros(self):
+        # the -D and -U switches in the order they were given
+        opts = getattr(self, '_options', None)
+        return list(getattr(opts, 'macros', None) or [])
+
+    def get_variants(self):
+        """
+        Reads the --variants file.  Each line names a variant and lists the
+        -D and -U switches it adds to the ones on the command line:
+
+            ntsc-debug: -DNTSC -DDEBUG
+            pal: -DPAL
+
+        Returns a list of (name, macros) pairs in the order of the file.
+        """
+        opts = getattr(self, '_options', None)
+        fname = getattr(opts, 'variants', None)
+        if fname is None:
+            return []
+
+        fin = open(fname)
+        lines = fin.readlines()
+        fin.close()
+
+        variants = []
+        for (lineno, line) in enumerate(lines):
+            line = line.strip()
+            if (len(line) == 0) or line.startswith('#'):
+                continue
+            (name, sep, switches) = line.partition(':')
+            name = name.strip()
+            if (len(sep) == 0) or (len(name) == 0):
+                raise CommandLineError('%s:%d: expected "name: switches"\n' % (fname, lineno + 1))
+
+            macros = []
+            words = shlex.split(switches)
+            while len(words):
+                word = words.pop(0)
+                if word[:2] not in ('-D', '-U'):
+                    raise CommandLineError('%s:%d: only -D and -U are allowed in a variant\n' % \
+                                           (fname, lineno + 1))
+                arg = word[2:]
+                if (len(arg) == 0) and len(words):
+                    arg = words.pop(0)
+                if len(arg) == 0:
+                    raise CommandLineError('%s:%d: %s needs a macro name\n' % (fname, lineno + 1, word))
+                macros.append( (word[:2] == '-D' and 'define' or 'undef', arg) )
+            variants.append( (name, macros) )
+
+        return variants
+
+    def get_jobs(self):
+        opts = getattr(self, '_options', None)
+        return max(getattr(opts, 'jobs', 1), 1)
+
+    def get_output(self):
+        if getattr(self, '_options', None):
+            return self._options.output
+
+    def get_target_name(self):
+        return getattr(self, '_target_name', None)
+
+    def is_rebuild_tables(self):
+        if getattr(self, '_options', None):
+            return self._options.rebuild_tables
+
+    def get_table_cache(self):
+        return getattr(self, '_table_cache', None)
+
+    def get_pp_cache(self):
+        if getattr(self, '_pp_cache', None) is None:
+            self._pp_cache = PPCache()
+        return self._pp_cache
+
+    def get_depfile(self):
+        if getattr(self, '_depfile', None) is None:
+            self._depfile = DepFile()
+        return self._depfile
+
+    def note_dependency(self, path):
+        self.get_depfile().add(path)
+
+    def write_dependencies(self):
+        opts = getattr(self, '_options', None)
+        if (opts is None) or not (opts.dep_file_md or opts.dep_file):
+            return None
+
+        target = opts.dep_target
+        if target is None:
+            target = self.get_output()
+        if target is None:
+            if self.is_precompile():
+                target = self.get_args()[0] + '.hpch'
+            else:
+                target = os.path.splitext(self.get_args()[0])[0]
+
+        fpath = opts.dep_file
+        if fpath is None:
+            fpath = target + '.d'
+
+        self.get_depfile().write(fpath, target, opts.dep_phony)
+        return fpath
+
+    def get_incbin(self, fpath):
+        # every #incbin of a file shares one blob and one mapping
+        if getattr(self, '_incbins', None) is None:
+            self._incbins = {}
+        fpath = os.path.abspath(fpath)
+        blob = self._incbins.get(fpath, None)
+        if blob is None:
+            blob = IncBin(fpath)
+            self._incbins[fpath] = blob
+        return blob
+
+    def get_macro_table(self):
+        if getattr(self, '_macro_table', None) is None:
+            self._macro_table = MacroTable()
+        return self._macro_table
+
+    def get_include_guards(self):
+        if getattr(self, '_include_guards', None) is None:
+            self._include_guards = IncludeGuards()
+        return self._include_guards
+
     def get_target(self):
         if getattr(self, '_target', None) is None:
             return None
@@ -276,59 +519,36 @@ class Session(object):
             return options.include
         return []
 
-    def get_file_path(self, f, inc_dirs=False):
-        search_paths = []
-
-        # calculate the correct path to the file 
-        if f[0] == '/':
-            # if it starts with a '/' then it is an absolute path
-            return f
-      
-        # add in the current file dir
-        search_paths.append(self.get_cur_dir())
-
-        # add in cwd as last option
-        search_paths.append(os.getcwd())
-
-        # add in the included directories
-        if inc_dirs and (len(self.get_include_dirs()) > 0):
-            search_paths.extend(self.get_include_dirs())
-
-        # look in the search paths for the file they specified
-        for path in search_paths:
-            if path[0] == '/':
-                test_path = os.path.join(path, f)
-            else:
-                test_path = os.path.join(os.getcwd(), path, f)
-
-            # if we've found it, then return the dir it resides in
-            if os.path.exists(test_path):
-                return test_path
+    def get_include_resolver(self):
+        if getattr(self, '_include_resolver', None) is None:
+            self._include_resolver = IncludeResolver(self.get_include_dirs())
+        return self._include_resolver
 
-        return None
+    def get_file_path(self, f, inc_dirs=False):
+        return self.get_include_resolver().resolve(f, self.get_cur_dir(), inc_dirs)
 
     def lexer(self, debug=False):
         target = getattr(self, '_target', None)
         if target:
-            return lex.lex(module=target.lexer(), debug=(self.is_debug() or debug))
+            return self.get_table_cache().lexer(target.lexer(), (self.is_debug() or debug))
         return None
 
     def parser(self, debug=False):
         target = getattr(self, '_target', None)
         if target:
-            return yacc.yacc(module=target.parser(), debug=(self.is_debug() or debug))
+            return self.get_table_cache().parser(target.parser(), (self.is_debug() or debug))
         return None
 
     def pp_lexer(self, debug=False):
         target = getattr(self, '_target', None)
         if target:
-            return lex.lex(module=target.pp_lexer(), debug=(self.is_debug() or debug))
+            return self.get_table_cache().lexer(target.pp_lexer(), (self.is_debug() or debug))
         return None
 
     def pp_parser(self, debug=False):
         target = getattr(self, '_target', None)
         if target:
-            return yacc.yacc(module=target.pp_parser(), debug=(self.is_debug() or debug))
+            return self.get_table_cache().parser(target.pp_parser(), (self.is_debug() or debug))
         return None
 
     def _strip_pp(self, pp):
@@ -338,45 +558,324 @@ class Session(object):
 
         for p in pp[1]:
             if inline:
-                if len(p.strip()) > 0:
-                    line.append(p)
-                if p[0] == '\n':
+                if len(p.value.strip()) > 0:
+                    line.append(p.value)
+                if p.value[0] == '\n':
                     output.append(' '.join(line))
                     inline = False
             else:
                 if isinstance(p, tuple):
                     import pdb; pdb.set_trace()
-                if len(p.strip()) > 0:
+                if len(p.value.strip()) > 0:
                     line = []
-                    line.append(p)
+                    line.append(p.value)
                     inline = True
         return ('program', output)
 
-    def go():
-        pass
+    @classmethod
+    def isolated(cls, options, args):
+        """
+        Starts a new session for the given files in a new compile context,
+        so a unit compiled in a pool worker sees exactly what it would if it
+        was compiled alone.
+        """
+        CompileContext().activate()
+
+        session = cls()
+        session._build_parser()
+        session._options = options
+        session._args = args
+        session.initialize_target()
+        return session
+
+    def go(self):
+        if self.is_precompile():
+            return self.precompile()
+        if self.get_variants():
+            return self.variants()
+        if (self.get_jobs() > 1) and (len(self.get_args()) > 1):
+            return self.parallel()
+        return self.compile(self.preprocess())
+
+    def variants(self):
+        """
+        Builds every variant in the --variants file, one after the other.
+        Each variant starts from the state after the command line macros and
+        adds its own.  All of them share the preprocessor cache, so a file is
+        only preprocessed again when a macro it tests differs from an
+        earlier variant.  Returns a list of (variant name, output) pairs.
+        """
+        symbols = SymbolTable().snapshot()
+        types = Types().snapshot()
+
+        output = []
+        for (name, macros) in self.get_variants():
+            SymbolTable().restore(symbols)
+            Types().restore(types)
+            print "Building variant %s..." % name
+            # the snapshot already has the command line macros in it
+            self._macros = self.get_macros() + macros
+            self.define_macros(macros)
+            output.append( (name, self.compile(self.preprocess())) )
+
+        return output
+
+    def parallel(self):
+        """
+        Preprocesses and compiles every file in a pool of worker processes.
+        The results come back in the order the files were given, whatever
+        order the workers finish in.  The symbols and types each unit
+        defines stay in its worker.
+        """
+        files = self.get_args()
+
+        # build the lexer and parser tables once instead of racing to
+        # write them from every worker
+        self.lexer()
+        self.parser()
+        self.get_pp_lexer()
+        self.get_pp_parser()
+
+        # the workers leave the dependency file to us
+        options = copy.copy(self._options)
+        options.jobs = 1
+        options.rebuild_tables = False
+        options.dep_file_md = False
+        options.dep_file = None
+
+        pool = multiprocessing.Pool(min(self.get_jobs(), len(files)))
+        try:
+            results = pool.map(_compile_unit, [ (options, f) for f in files ], 1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        output = []
+        for (units, deps) in results:
+            output.extend(units)
+            for dep in deps:
+                self.note_dependency(dep)
+        self.write_dependencies()
+
+        return output
+
+    def precompile(self):
+        files = self.get_args()
+        if len(files) != 1:
+            raise CommandLineError('--precompile takes exactly one header\n')
+
+        f = os.path.abspath(files[0])
+        output = self.get_output()
+        if output is None:
+            output = files[0] + '.hpch'
+
+        # preprocess_file records everything the header and its includes do,
+        # the entry is the last one it recorded or replayed
+        self.preprocess_file(f)
+        entry = self.get_pp_cache().last
+        if (entry is None) or (entry.path != f):
+            raise CommandLineError('%s is skipped by its include guard\n' % files[0])
+
+        # a pinned entry is only checked against its deps, which hold the
+        # files it included but not the header itself
+        entry.deps[f] = entry.digest
+
+        PrecompiledHeader.save(output, entry, self.get_target_name())
+        print "Precompiled %s to %s" % (files[0], output)
+        self.write_dependencies()
+        return output
+
+    def get_pp_parser(self, debug=False):
+        # one parser is shared by the root file and all of its includes,
+        # the PLY parser keeps its parse state on the stack so it is reentrant
+        if getattr(self, '_pp_parser_obj', None) is None:
+            self._pp_parser_obj = self.pp_parser(debug)
+        return self._pp_parser_obj
+
+    def get_pp_lexer(self, depth=0, debug=False):
+        # every include depth needs its own lexer state, so clone the
+        # root lexer once per depth and reuse it for every file at that depth
+        if getattr(self, '_pp_lexers', None) is None:
+            self._pp_lexers = []
+        if len(self._pp_lexers) == 0:
+            self._pp_lexers.append(self.pp_lexer(debug))
+        while len(self._pp_lexers) <= depth:
+            self._pp_lexers.append(self._pp_lexers[0].clone())
+
+        lexer = self._pp_lexers[depth]
+        lexer.lineno = 1
+        return lexer
+
+    def get_include_depth(self):
+        return len(getattr(self, '_cur_file', None) or [])
+
+    def _is_guarded(self, f):
+        # true if the include guard of the file is already defined
+        guards = self.get_include_guards()
+        guard = guards.get_guard(f)
+        if guard is None:
+            return False
+        macro = PPMacro.lookup(guard)
+        self.get_pp_cache().note_lookup(guard, macro)
+        if macro is None:
+            return False
+        guards.elided += 1
+        if self.is_debug():
+            print "Skipping %s, guarded by %s" % (f, guard)
+        return True
+
+    def define_macros(self, macros):
+        """
+        Applies a list of ('define', 'NAME[=VALUE]') and ('undef', 'NAME')
+        switches in order.  A define is run through the preprocessor as a
+        #define line so it takes anything a #define does.
+        """
+        for (kind, arg) in macros:
+            if kind == 'undef':
+                if PPMacro.lookup(arg) is not None:
+                    SymbolTable().del_symbol(arg)
+                continue
+
+            (name, sep, value) = arg.partition('=')
+            if len(sep) == 0:
+                value = '1'
+            line = ' '.join([ '#define', name, value ]).rstrip() + '\n'
+            pp = self.get_target().pp_parser()
+            state = pp.save_state(self.COMMAND_LINE)
+            try:
+                self.get_pp_parser().parse(line, lexer=pp.expander(self.get_pp_lexer()))
+            finally:
+                pp.restore_state(state)
+
+    def _note_entry_dependencies(self, entry):
+        # a cached file still depends on everything it read the first time
+        self.note_dependency(entry.path)
+        for path in sorted(entry.deps.iterkeys()):
+            self.note_dependency(path)
+        for event in entry.events:
+            if event[0] == 'incbin':
+                self.note_dependency(event[1])
 
-    """
     def preprocess_file(self, f, debug=False):
-        pp_lexer = self.pp_lexer(debug)
-        pp_parser = self.pp_parser(debug)
+        # an included file is given as the PPINCLUDE token of its #include
+        parent = getattr(f, 'pos', 0)
+        f = os.path.abspath(str(f))
+        cache = self.get_pp_cache()
+        guards = self.get_include_guards()
+
+        # skip files whose include guard is already defined
+        if self._is_guarded(f):
+            return ('program', [])
+
+        # replay the file from the cache if the macros it tests are unchanged
+        entry = cache.lookup(f)
+        if entry is not None:
+            print "Preprocessing %s (cached)..." % f
+            guards.add(f, entry.guard)
+            self._note_entry_dependencies(entry)
+            return cache.replay(entry, self.get_target())
+        self.note_dependency(f)
+
+        pp_lexer = self.get_pp_lexer(self.get_include_depth(), debug)
+        pp_parser = self.get_pp_parser(debug)
 
         # read the file
         fin = open(f)
         inf = fin.read()
         fin.close()
+        guard = guards.detect(inf)
+
+        # included files start with their own conditional state
+        pp = self.get_target().pp_parser()
+        state = pp.save_state(f, parent=parent)
 
         print "Preprocessing %s..." % f
         self.push_cur_file(f)
         self.push_cur_dir(os.path.dirname(f))
-        result = pp_parser.parse(inf, lexer=pp_lexer, debug=(self.is_debug() or debug))
-        self.pop_cur_dir()
-        self.pop_cur_file()
+        cache.begin(f)
+        try:
+            result = pp_parser.parse(inf, lexer=pp.expander(pp_lexer), debug=(self.is_debug() or debug))
+        except:
+            cache.abort()
+            raise
+        finally:
+            pp.restore_state(state)
+            self.pop_cur_dir()
+            self.pop_cur_file()
+
+        # an empty file has no program
+        if result is None:
+            result = ('program', [])
+        cache.end(result[1]).guard = guard
+        guards.add(f, guard)
+
         if self.is_graph():
             graph = PPGraph(os.path.basename(f) + '.pdf', result)
             graph.save()
 
         return result
 
+    def preprocess_stream(self, f, debug=False):
+        """
+        Generator version of preprocess_file.  The tokens are yielded as
+        they are produced and included files are preprocessed when their
+        #include is reached, so only the open files and the lines being
+        parsed are held in memory.  Streamed files are not added to the
+        preprocessor cache since that would mean keeping all of their tokens.
+        """
+        parent = getattr(f, 'pos', 0)
+        f = os.path.abspath(str(f))
+        cache = self.get_pp_cache()
+        guards = self.get_include_guards()
+
+        # skip files whose include guard is already defined
+        if self._is_guarded(f):
+            return
+
+        # replay the file from the cache if the macros it tests are unchanged
+        entry = cache.lookup(f)
+        if entry is not None:
+            print "Preprocessing %s (cached)..." % f
+            guards.add(f, entry.guard)
+            self._note_entry_dependencies(entry)
+            for tok in cache.replay(entry, self.get_target())[1]:
+                yield tok
+            return
+        self.note_dependency(f)
+
+        pp_lexer = self.get_pp_lexer(self.get_include_depth(), debug)
+        pp_parser = self.get_pp_parser(debug)
+
+        # read the file
+        fin = open(f)
+        inf = fin.read()
+        fin.close()
+        guard = guards.detect(inf)
+
+        # included files start with their own conditional state
+        pp = self.get_target().pp_parser()
+        state = pp.save_state(f, stream=True, parent=parent)
+
+        print "Preprocessing %s..." % f
+        self.push_cur_file(f)
+        self.push_cur_dir(os.path.dirname(f))
+        try:
+            for tok in pp.stream(pp_parser, pp_lexer, inf, (self.is_debug() or debug)):
+                if tok.type == 'PPINCLUDE':
+                    for itok in self.preprocess_stream(tok, debug):
+                        yield itok
+                else:
+                    yield tok
+        finally:
+            pp.restore_state(state)
+            self.pop_cur_dir()
+            self.pop_cur_file()
+
+        guards.add(f, guard)
+
     def preprocess(self):
         output = []
 
@@ -384,9 +883,20 @@ class Session(object):
         if len(files) == 0:
             raise CommandLineError('No files to compile\n')
 
+        # pick up any changes to the include directories since the last run
+        self.get_include_resolver().refresh()
+
         try:
             for f in files:
+                if self.is_stream():
+                    # nothing is preprocessed until the compiler asks for it
+                    output.append( (f, ('program', self.preprocess_stream(f)), None) )
+                    continue
                 pp = self.preprocess_file(f)
+                if self.is_direct_tokens():
+                    # the compiler takes the tokens, no text needed
+                    output.append( (f, pp, None) )
+                    continue
                 clean = self._strip_pp(pp)
                 sio = cStringIO.StringIO()
                 sio.write('\n'.join(clean[1]))
@@ -399,6 +909,13 @@ class Session(object):
                 p.print_help()
             raise e
 
+        if not self.is_stream():
+            self.write_dependencies()
+
+        if self.is_debug() and not self.is_stream():
+            print "Include guards elided %d includes" % self.get_include_guards().elided
+            print self.get_macro_table()
+
         return output
 
     def compile_file(self, cunit, debug=False):
@@ -408,7 +925,11 @@ class Session(object):
         print "Compiling %s..." % cunit[0]
         self.push_cur_file(cunit[0])
         self.push_cur_dir(os.path.dirname(cunit[0]))
-        result = parser.parse(cunit[2], lexer=lexer, debug=(self.is_debug() or debug))
+        if cunit[2] is None:
+            stream = TokenStream(self.get_target().lexer(), cunit[1][1], lexer)
+            result = parser.parse(lexer=stream, debug=(self.is_debug() or debug))
+        else:
+            result = parser.parse(cunit[2], lexer=lexer, debug=(self.is_debug() or debug))
         self.pop_cur_dir()
         self.pop_cur_file()
 
@@ -418,13 +939,19 @@ class Session(object):
         '''
         cus is a list of tuples, each tuple contains the following:
          0: full path to compilation unit file
-         1: the pre-processor tuple with AST ('program', [ ...tokens... ])
-         2: the pre-processor output
+         1: the pre-processor tuple with AST ('program', [ ...tokens... ]), the
+            tokens are a generator when streaming
+         2: the pre-processor output, None when the tokens are handed over directly
         '''
 
         # reset the symbol table before beginning compilation
         SymbolTable().reset_state()
 
+        # streamed files are preprocessed as they are compiled, so they
+        # still need the command line macros
+        if self.is_stream():
+            self.define_macros(getattr(self, '_macros', []))
+
         output = []
         try:
             for cunit in cunits:
@@ -433,7 +960,24 @@ class Session(object):
         except RuntimeError, e:
             import pdb; pdb.set_trace()
 
-        return output
-    """
+        # streamed includes are only known once the tokens have been consumed
+        if self.is_stream():
+            self.write_dependencies()
 
+        return output
 
+def _macro_option(option, opt, value, parser, kind):
+    # -D and -U share a list so they are applied in command line order
+    parser.values.macros.append( (kind, value) )
+
+def _compile_unit(job):
+    # runs in a pool worker, see Session.parallel
+    (options, f) = job
+    session = Session.isolated(options, [ f ])
+    output = []
+    for (fname, pp, text, cc) in session.compile(session.preprocess()):
+        # streamed tokens are gone once they are compiled
+        if session.is_stream():
+            pp = (pp[0], [])
+        output.append( (fname, pp, text, cc) )
+    return (output, session.get_depfile().get_paths())
@@ -29,81 +29,194 @@ or implied, of David Huseby.
 
 import os
 import copy
-
-class SymbolTable(object):
+import itertools
+from compilecontext import ContextState
+
+class Scope(object):
+    """
+    A namespace in the symbol table.  It holds the symbols defined in it and
+    the scopes nested in it by name, so going back into a namespace finds
+    the symbols it had.  Scopes are shared between a symbol table and its
+    snapshots and are only changed by the table that owns them, any other
+    table copies the scope before changing it.
+    """
+
+    def __init__(self, name, namespace, owner):
+        self.name = name
+        self.namespace = namespace
+        self.owner = owner
+        self.symbols = {}
+        self.children = {}
+
+    def copy(self, owner):
+        # the nested scopes and the symbols are shared with the copy
+        scope = Scope(self.name, self.namespace, owner)
+        scope.symbols = dict(self.symbols)
+        scope.children = dict(self.children)
+        return scope
+
+class SymbolTable(ContextState):
 
     GLOBAL_NAMESPACE = '__global__'
     ANON_NAMESPACE = '__anonymous__'
 
-    _shared_state = {}
+    _state_name = 'symbols'
+
+    # every reset and scope change starts a new epoch, the counter is shared
+    # by all states so an epoch number is never handed out twice
+    _epochs = itertools.count(1)
 
-    def __new__(cls, *a, **k):
-        obj = object.__new__(cls, *a, **k)
-        obj.__dict__ = cls._shared_state
-        return obj
+    def init_state(self):
+        self.reset_state()
 
     def current_namespace(self):
-        if not hasattr(self, '_scope_stack'):
-            self.reset_state()
-        return '.'.join(self._scope_stack)
+        return self._path[-1].namespace
 
     def reset_state(self):
-        self._scope_stack = [ self.GLOBAL_NAMESPACE ]
-        self._scopes = {}
+        # the top scope has no name, the global namespace and any namespace
+        # that doesn't start in it are nested in it.  _path is the scopes
+        # from the top one to the current one.
+        self._owner = object()
+        top = Scope(None, None, self._owner)
+        top.children[self.GLOBAL_NAMESPACE] = Scope(self.GLOBAL_NAMESPACE, self.GLOBAL_NAMESPACE, self._owner)
+        self._path = [ top, top.children[self.GLOBAL_NAMESPACE] ]
+        self._generations = {}
+        self._epoch = self._epochs.next()
+
+    def _child(self, path, name):
+        # the scope nested in the last one on the path, made if it's missing
+        scope = path[-1].children.get(name)
+        if scope is None:
+            self._own(path)
+            parent = path[-1]
+            if parent.namespace is None:
+                namespace = name
+            else:
+                namespace = parent.namespace + '.' + name
+            scope = Scope(name, namespace, self._owner)
+            parent.children[name] = scope
+        return scope
+
+    def _own(self, path):
+        """
+        Makes every scope on the path one this table may change, copying the
+        ones it shares with a snapshot.  Only the scopes on the path are
+        copied, everything else stays shared.
+        """
+        owner = self._owner
+        if path[-1].owner is owner:
+            return
+        for i in xrange(len(path)):
+            if path[i].owner is not owner:
+                path[i] = path[i].copy(owner)
+                if i > 0:
+                    path[i - 1].children[path[i].name] = path[i]
 
     def scope_push(self, namespace=ANON_NAMESPACE):
-        if not hasattr(self, '_scope_stack'):
-            self.reset_state()
-        self._scope_stack.append(namespace)
+        self._path.append(self._child(self._path, namespace))
+        self._epoch = self._epochs.next()
 
     def scope_pop(self):
-        if len(self._scope_stack) <= 1:
+        if len(self._path) <= 2:
             raise ParseFatalException("can't pop scope from empty scope stack")
-        self._scope_stack.pop()
+        self._path.pop()
+        self._epoch = self._epochs.next()
+
+    def generation(self, name):
+        """
+        Returns a stamp that changes whenever the symbol the name resolves to
+        might have changed, so lookups of the name can be memoized.
+        """
+        return (self._epoch, self._generations.get(name, 0))
+
+    def _touch(self, name):
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+    def _find_path(self, namespace, create=False):
+        # an explicit namespace is a dotted path, without create this returns
+        # the scopes down to the innermost one on the path that exists
+        path = [ self._path[0] ]
+        for name in namespace.split('.'):
+            if create:
+                scope = self._child(path, name)
+            else:
+                scope = path[-1].children.get(name)
+                if scope is None:
+                    break
+            path.append(scope)
+        if create:
+            self._own(path)
+            # the current scopes might have been copied on the way
+            current = self._path
+            current[0] = path[0]
+            for i in xrange(1, len(current)):
+                current[i] = current[i - 1].children[current[i].name]
+        if len(path) == 1:
+            return None
+        return path
+
+    def snapshot(self):
+        """
+        Returns the state for restore() to go back to later.  Nothing is
+        copied, from now on both the snapshot and this table share the
+        scopes and this table copies a scope the first time it changes it.
+        """
+        self._owner = object()
+        return tuple(self._path)
+
+    def restore(self, snapshot):
+        # the snapshot stays shared, so it can be restored again
+        self._owner = object()
+        self._path = list(snapshot)
+        self._generations = {}
+        self._epoch = self._epochs.next()
 
     def get_scopes(self):
-        return self._scopes
+        # every scope's symbols by its dotted namespace
+        scopes = {}
+        stack = self._path[0].children.values()
+        while len(stack):
+            scope = stack.pop()
+            scopes[scope.namespace] = scope.symbols
+            stack.extend(scope.children.itervalues())
+        return scopes
 
     def new_symbol(self, name, value, namespace=None):
         if namespace is None:
-            namespace = self.current_namespace()
-
-        # make sure the scope exists
-        if not self._scopes.has_key(namespace):
-            self._scopes[namespace] = {}
+            path = self._path
+            self._own(path)
+        else:
+            path = self._find_path(namespace, True)
 
         # add the symbol to the scope
-        self._scopes[namespace][name] = value
+        path[-1].symbols[name] = value
+        self._touch(name)
 
     def del_symbol(self, name, namespace=None):
         if namespace is None:
-            namespace = self.current_namespace()
-
-        # make sure the scope exists
-        if not self._scopes.has_key(namespace):
-            self._scopes[namespace] = {}
+            path = self._path
+            self._own(path)
+        else:
+            path = self._find_path(namespace, True)
 
-        del self._scopes[namespace][name]
+        del path[-1].symbols[name]
+        self._touch(name)
 
     def lookup_symbol(self, name, namespace=None):
         if namespace is None:
-            namespace = self.current_namespace()
-        ns = namespace.split('.')  
-
-        while len(ns):
-            # make sure it is a valid scope
-            if not self._scopes.has_key('.'.join(ns)):
-                ns.pop()
-                continue
-
-            # now grab the scope and check for the symbol
-            scope = self._scopes['.'.join(ns)]
-            if scope.has_key(name):
-                return scope[name]
-
-            # no symbol here, so try the parent scope
-            ns.pop()
+            path = self._path
+        else:
+            path = self._find_path(namespace)
+            if path is None:
+                return None
+
+        # try each scope out to the global one, the top scope is empty
+        i = len(path) - 1
+        while i:
+            symbols = path[i].symbols
+            if name in symbols:
+                return symbols[name]
+            i -= 1
 
         # not in any of the scopes
         return None
-
@@ -0,0 +1,168 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import sys
+import imp
+import hashlib
+import threading
+import ply.lex as lex
+import ply.yacc as yacc
+
+class TableCache(object):
+    """
+    This manages the on-disk cache of the PLY lexer and LALR parser tables for
+    a target.  Each target gets its own cache directory and every table file is
+    named after the class that defines the rules and a hash of the grammar so
+    the generic/6502, Ricoh2A0X and NES grammars never overwrite each other's
+    tables.  The tables are generated once and then loaded in optimized mode.
+
+    The cache directory is shared by every run, so a table is written to a
+    file of its own and renamed into place once it is complete, and a table
+    that fails to load is thrown away and generated again.
+    """
+
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.hlakit', 'tables')
+
+    def __init__(self, target_name, root=None, rebuild=False):
+        if root is None:
+            root = self.DEFAULT_ROOT
+        self._dir = os.path.join(root, target_name)
+        self._rebuild = rebuild
+        self._rebuilt = set()
+
+    def get_dir(self):
+        return self._dir
+
+    def _rule_sources(self, obj, prefix):
+        sources = []
+        for name in sorted(dir(obj)):
+            if not name.startswith(prefix):
+                continue
+            rule = getattr(obj, name)
+            if isinstance(rule, str):
+                sources.append( (name, rule) )
+            elif callable(rule):
+                sources.append( (name, rule.__doc__) )
+        return sources
+
+    def _grammar_hash(self, obj, prefix):
+        # the hash covers everything PLY builds the tables from
+        grammar = [ getattr(obj, 'tokens', None),
+                    getattr(obj, 'literals', None),
+                    getattr(obj, 'precedence', None),
+                    getattr(obj, 'start', None),
+                    self._rule_sources(obj, prefix),
+                    lex.__tabversion__,
+                    yacc.__tabversion__,
+                    sys.version_info[:2] ]
+        return hashlib.md5(repr(grammar)).hexdigest()
+
+    def _table_name(self, obj, prefix):
+        cls = obj.__class__
+        name = '%s_%s' % (cls.__module__, cls.__name__)
+        name = name.replace('.', '_')
+        return '%s_%s' % (name, self._grammar_hash(obj, prefix)[:16])
+
+    def _prepare(self, path):
+        # make sure the cache directory exists
+        if not os.path.isdir(self._dir):
+            try:
+                os.makedirs(self._dir)
+            except OSError:
+                pass
+
+        # throw away any stale table the first time it is asked for when
+        # rebuilding the tables was requested
+        if self._rebuild and (path not in self._rebuilt):
+            self._rebuilt.add(path)
+            for p in (path, path + 'c'):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def _temp_name(self, name):
+        # unique to this process and thread so two first runs never write
+        # the same file
+        return '%s_%d_%d' % (name, os.getpid(), threading.current_thread().ident)
+
+    def _install(self, tmp, path):
+        if not os.path.exists(tmp):
+            return
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            self._discard(tmp)
+
+    def _discard(self, path):
+        for p in (path, path + 'c'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def lexer(self, module, debug=False):
+        name = self._table_name(module, 't_')
+        path = os.path.join(self._dir, name + '.py')
+        self._prepare(path)
+
+        if os.path.exists(path):
+            try:
+                lextab = imp.load_source('hlakit_lextab_' + name, path)
+                return lex.lex(module=module, debug=debug, optimize=1,
+                               lextab=lextab, outputdir=self._dir)
+            except Exception:
+                self._discard(path)
+
+        tmp = self._temp_name(name)
+        lexer = lex.lex(module=module, debug=debug, optimize=1,
+                        lextab=tmp, outputdir=self._dir)
+        self._install(os.path.join(self._dir, tmp + '.py'), path)
+        return lexer
+
+    def parser(self, module, debug=False):
+        name = self._table_name(module, 'p_')
+        path = os.path.join(self._dir, name + '.pickle')
+        self._prepare(path)
+
+        # PLY only falls back to generating the tables on an ImportError, a
+        # truncated pickle would fail every run after it
+        if os.path.exists(path):
+            try:
+                return yacc.yacc(module=module, debug=debug, optimize=1,
+                                 picklefile=path, outputdir=self._dir,
+                                 debugfile=name + '.out')
+            except Exception:
+                self._discard(path)
+
+        tmp = os.path.join(self._dir, self._temp_name(name) + '.pickle')
+        parser = yacc.yacc(module=module, debug=debug, optimize=1,
+                           picklefile=tmp, outputdir=self._dir,
+                           debugfile=name + '.out')
+        self._install(tmp, path)
+        return parser
@@ -0,0 +1,162 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+from linetable import LineTable
+
+class StreamToken(object):
+    # one of these is made for every token the compiler parses, so they are
+    # slotted, and the file and line are only looked up when something asks
+    # for them
+    __slots__ = ('type', 'value', 'pos', 'lexer')
+
+    lexpos = 0
+
+    @property
+    def lineno(self):
+        return LineTable().resolve(self.pos)[1]
+
+    @property
+    def fname(self):
+        return LineTable().get_location(self.pos)[0]
+
+    def __str__(self):
+        return 'StreamToken(%s,%r,%d)' % (self.type, self.value, self.lineno)
+
+    __repr__ = __str__
+
+class TokenStream(object):
+    """
+    This stands in for the compiler lexer and feeds the preprocessor tokens
+    straight to the compiler parser, so the preprocessor output never has to
+    be turned back into text and lexed a second time.  The tokens can come
+    from any iterable, including the streaming preprocessor.
+
+    The tokens are classified the way the compiler lexer classifies them in
+    the preprocessor text output: identifiers go through the lexer's t_ID so
+    reserved words, types, opcodes and conditionals are recognized, 'struct
+    name' becomes a TYPE and '# incbin' becomes PPINCBIN.  Tokens that carry
+    no type are handed to the real lexer.
+    """
+
+    def __init__(self, module, tokens, lexer=None):
+        self._module = module
+        self._types = set(module.tokens)
+        self._literals = module.literals
+        self._tokens = iter(tokens)
+        self._ahead = []
+        self._pending = []
+        self._lexer = lexer
+        self.pos = 0
+
+    @property
+    def lineno(self):
+        return LineTable().resolve(self.pos)[1]
+
+    @property
+    def fname(self):
+        return LineTable().get_location(self.pos)[0]
+
+    def input(self, data):
+        pass
+
+    def _next(self):
+        if len(self._ahead):
+            return self._ahead.pop()
+        return next(self._tokens, None)
+
+    def _peek(self):
+        if len(self._ahead) == 0:
+            self._ahead.append(next(self._tokens, None))
+        return self._ahead[-1]
+
+    def _new_token(self, type_, value, src):
+        t = StreamToken()
+        t.type = type_
+        t.value = value
+        t.pos = getattr(src, 'pos', self.pos)
+        t.lexer = self
+        return t
+
+    def _relex(self, value):
+        if self._lexer is None:
+            raise Exception('no lexer to classify token %r' % value)
+        self._lexer.input(str(value))
+        while True:
+            t = self._lexer.token()
+            if t is None:
+                break
+            t.lineno = self.lineno
+            t.pos = self.pos
+            self._pending.append(t)
+
+    def _classify(self, tok):
+        type_ = getattr(tok, 'type', None)
+        if type_ is None:
+            self._relex(tok)
+            return None
+
+        if type_ == 'NL':
+            return None
+
+        if type_ == 'ID':
+            nxt = self._peek()
+            if (tok.value == 'struct') and (getattr(nxt, 'type', None) == 'ID'):
+                self._next()
+                return self._new_token('TYPE', 'struct ' + nxt.value, tok)
+            return self._module.t_ID(self._new_token('ID', tok.value, tok))
+
+        if type_ == 'HASH':
+            nxt = self._peek()
+            if (getattr(nxt, 'type', None) == 'ID') and (nxt.value.lower() == 'incbin'):
+                self._next()
+                return self._new_token('PPINCBIN', '#incbin', tok)
+
+        if (type_ in self._types) or (type_ in self._literals):
+            return self._new_token(type_, tok.value, tok)
+
+        self._relex(tok)
+        return None
+
+    def token(self):
+        while True:
+            if len(self._pending):
+                return self._pending.pop(0)
+
+            tok = self._next()
+            if tok is None:
+                return None
+
+            self.pos = getattr(tok, 'pos', self.pos)
+
+            t = self._classify(tok)
+            if t is not None:
+                return t
+
+    def __iter__(self):
+        return iter(self.token, None)
@@ -0,0 +1,98 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+def number_value(text):
+    """
+    Returns the value of a number literal the way the lexer spells them,
+    decimal, kilo, 0x and $ hex and % binary, or None when the text isn't a
+    literal.
+    """
+    if isinstance(text, (int, long)):
+        return text
+    try:
+        if text[0] == '$':
+            return int(text[1:], 16)
+        if text[0] == '%':
+            return int(text[1:], 2)
+        if text[:2] in ('0x', '0X'):
+            return int(text[2:], 16)
+        if text[-1] in 'kK':
+            return int(text[:-1]) * 1024
+        return int(text)
+    except (ValueError, TypeError, IndexError):
+        return None
+
+def align_up(offset, align):
+    return (offset + align - 1) // align * align
+
+class MemberSelector(list):
+    """
+    A selector whose members were turned into an offset.  It is still the
+    list the parser always made, it just remembers the type of the member
+    so sizeof() can still tell what it selects.
+    """
+
+    def __init__(self, items, type_name):
+        super(MemberSelector, self).__init__(items)
+        self.type_name = type_name
+
+class TypeLayout(object):
+    """
+    The size and alignment of a type and where its members go.  Every member
+    of a struct, including the members of the structs nested in it, is in
+    fields under its dotted path, so a whole selector chain resolves to an
+    offset in one dict lookup.
+    """
+
+    def __init__(self, size, align=1):
+        self.size = size
+        self.align = align
+
+        # (name, offset, type name) in declaration order
+        self.members = []
+
+        # dotted path to (offset, type name)
+        self.fields = {}
+
+    def add_member(self, name, type_name, layout):
+        offset = align_up(self.size, layout.align)
+        self.members.append( (name, offset, type_name) )
+        self.fields[name] = (offset, type_name)
+        for (path, (o, t)) in layout.fields.iteritems():
+            self.fields['%s.%s' % (name, path)] = (offset + o, t)
+        self.size = offset + layout.size
+        self.align = max(self.align, layout.align)
+
+    def finish(self):
+        # pad the struct out so arrays of it keep every record aligned
+        self.size = align_up(self.size, self.align)
+
+    def __str__(self):
+        ms = [ '%s @ %d' % (m[0], m[1]) for m in self.members ]
+        return 'size %d, align %d { %s }' % (self.size, self.align, ', '.join(ms))
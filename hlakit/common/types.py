@@ -29,37 +29,81 @@ or implied, of David Huseby.
 
 import os
 import copy
+import itertools
+from compilecontext import ContextState
+from basetype import BaseType
+from arraytype import ArrayType
+from structtype import StructType
+from typelayout import TypeLayout, number_value
 
-class Types(object):
+class Types(ContextState):
 
-    _shared_state = {}
+    _state_name = 'types'
 
-    def __new__(cls, *a, **k):
-        obj = object.__new__(cls, *a, **k)
-        obj.__dict__ = cls._shared_state
-        return obj
+    # every change to the set of types gets a new version, the counter is
+    # shared by all states so a version number is never handed out twice
+    _versions = itertools.count(1)
 
-    @staticmethod
-    def reset():
-        _shared_state = {}
+    @classmethod
+    def reset(cls):
+        # throws away every type in the current context
+        cls._shared_state = {}
 
-    def new_type(self, name, t):
+    def _writable(self):
+        # the dict is shared with a snapshot until the first change after it
         if getattr(self, '_types', None) is None:
             self._types = {}
+        elif getattr(self, '_shared', False):
+            self._types = dict(self._types)
+        self._shared = False
+
+    def new_type(self, name, t):
+        self._writable()
 
         if self._types.has_key(name):
             raise Exception('overriding existing type %s...' % name)
 
         self._types[name] = t
+        self._version = self._versions.next()
 
     def update_type(self, name, t):
-        if getattr(self, '_types', None) is None:
-            self._types = {}
+        self._writable()
 
         if not self._types.has_key(name):
             raise Exception('trying to update unknown type %s...' % name)
 
         self._types[name] = t
+        self._version = self._versions.next()
+
+        # any layout might have this type in it somewhere
+        self._layouts = {}
+
+    def snapshot(self):
+        # nothing is copied until one of the two sides changes
+        if getattr(self, '_types', None) is None:
+            self._types = {}
+        self._shared = True
+        return self._types
+
+    def restore(self, snapshot):
+        self._types = snapshot
+        self._shared = True
+        self._version = self._versions.next()
+        self._layouts = {}
+
+    @classmethod
+    def version(cls):
+        """
+        Returns the version of the shared types without making an instance,
+        so callers can cheaply tell when something they built from the
+        types is stale.
+        """
+        return cls._shared_state.get('_version', 0)
+
+    @classmethod
+    def get_table(cls):
+        # the shared name to type dict, don't change it
+        return cls._shared_state.get('_types', None) or {}
 
     def lookup_type(self, name):
         if getattr(self, '_types', None) is None:
@@ -67,6 +111,69 @@ class Types(object):
 
         return self._types.get(name, None)
 
+    def layout(self, name):
+        """
+        Returns the TypeLayout of the named type, or None when its size isn't
+        known yet.  Layouts are worked out once and kept until a type is
+        updated, adding new types can't change the layout of an old one.
+        """
+        layouts = getattr(self, '_layouts', None)
+        if layouts is None:
+            layouts = self._layouts = {}
+
+        layout = layouts.get(name, None)
+        if layout is None:
+            t = self.lookup_type(name)
+            if t is None:
+                return None
+            layout = self._build_layout(t)
+            if layout is not None:
+                layouts[name] = layout
+        return layout
+
+    def _build_layout(self, t):
+        if isinstance(t, BaseType):
+            if t.size is None:
+                return None
+            return TypeLayout(t.size, t.align)
+
+        if isinstance(t, ArrayType):
+            if t.record_type is None:
+                return None
+            record = self.layout(t.record_type.name)
+            length = number_value(t.length)
+            if (record is None) or (length is None):
+                return None
+            return TypeLayout(record.size * length, record.align)
+
+        if isinstance(t, StructType):
+            layout = TypeLayout(0)
+            for (name, type_name) in t.members:
+                member = self.layout(type_name)
+                if member is None:
+                    return None
+                layout.add_member(name, type_name, member)
+            layout.finish()
+            return layout
+
+        return None
+
+    def sizeof(self, name):
+        layout = self.layout(name)
+        if layout is None:
+            return None
+        return layout.size
+
+    def member(self, name, path):
+        """
+        Returns the (offset, type name) of the member at the dotted path in
+        the named type, or None if there isn't one.
+        """
+        layout = self.layout(name)
+        if layout is None:
+            return None
+        return layout.fields.get(path, None)
+
     def __str__(self):
         s = "Types:\n"
         for (k, v) in self._types.iteritems():
@@ -42,6 +42,15 @@ class Lexer(CommonLexer):
         'pointer':      'TYPE'
     }
 
+    # base type sizes in bytes, the 6502 doesn't align anything
+    type_sizes = {
+        'byte':         1,
+        'char':         1,
+        'bool':         1,
+        'word':         2,
+        'pointer':      2
+    }
+
     # 6502 conditional tokens 
     conditionals = {
         'is':           'IS',
@@ -136,35 +145,21 @@ class Lexer(CommonLexer):
              + [ 'REG' ]
 
     # registers on the 6502
-    t_REG = r'(?i)reg\.(a|x|y)'
+    t_REG = r'[rR][eE][gG]\.[aAxXyY]'
 
     # override t_INTERRUPT to be 6502 specific
     t_INTERRUPT = r'interrupt\.(start|nmi|irq)'
 
-    # identifier
-    def t_ID(self, t):
-        r'[a-zA-Z_][\w]*'
-
-        value = t.value.lower()
-
-        # case insensitive
-        t.type = self.conditionals.get(value, None) # check for conditionals
-        if t.type != None:
-            t.value = value
-            return t
-
-        # case insensitive
-        t.type = self.opcodes.get(value, None) # check for opcode words
-        if t.type != None:
-            t.value = value
-            return t
-
-        return super(Lexer, self).t_ID(t)
+    # identifiers, the conditionals and opcodes are case insensitive and
+    # win over everything else
+    def id_classes(self):
+        return super(Lexer, self).id_classes() \
+               + [ (self.opcodes, True), (self.conditionals, True) ]
 
     def __init__(self):
         super(Lexer, self).__init__()
 
         # build the type records for the basic types
         for t in self.types.iterkeys():
-            Types().new_type(t, BaseType(t))
+            Types().new_type(t, BaseType(t, self.type_sizes[t]))
 
@@ -37,8 +37,9 @@ class PPLexer(CommonPPLexer):
                'PPINTNMI',
                'PPINTIRQ' ]
 
-    t_PPINTSTART    = r'\#(?i)[\t ]*interrupt[\t ]*\.[\t ]*start'
-    t_PPINTNMI      = r'\#(?i)[\t ]*interrupt[\t ]*\.[\t ]*nmi'
-    t_PPINTIRQ      = r'\#(?i)[\t ]*interrupt[\t ]*\.[\t ]*irq'
+    directives = CommonPPLexer.extend_directives({
+                    'interrupt.start':  'PPINTSTART',
+                    'interrupt.nmi':    'PPINTNMI',
+                    'interrupt.irq':    'PPINTIRQ' })
 
 
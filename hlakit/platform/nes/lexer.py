@@ -52,21 +52,19 @@ class Lexer(Ricoh2A0XLexer):
                'PPALIGN' ]
 
     # NES compile time pre-processor directives
-    t_PPRAMORG          = r'\#(?i)[\t ]*ram\.org'
-    t_PPRAMEND          = r'\#(?i)[\t ]*ram\.end'
-
-    t_PPROMORG          = r'\#(?i)[\t ]*rom\.org'
-    t_PPROMBANK         = r'\#(?i)[\t ]*rom\.bank'
-    t_PPROMBANKSIZE     = r'\#(?i)[\t ]*rom\.banksize'
-    t_PPROMEND          = r'\#(?i)[\t ]*rom\.end'
-
-    t_PPCHRBANK         = r'\#(?i)[\t ]*chr\.bank'
-    t_PPCHRBANKSIZE     = r'\#(?i)[\t ]*chr\.banksize'
-    t_PPCHRLINK         = r'\#(?i)[\t ]*chr\.link'
-    t_PPCHREND          = r'\#(?i)[\t ]*chr\.end'
-
-    t_PPSETPAD          = r'\#(?i)[\t ]*setpad'
-    t_PPALIGN           = r'\#(?i)[\t ]*align'
+    directives = Ricoh2A0XLexer.extend_directives({
+                    'ram.org':          'PPRAMORG',
+                    'ram.end':          'PPRAMEND',
+                    'rom.org':          'PPROMORG',
+                    'rom.bank':         'PPROMBANK',
+                    'rom.banksize':     'PPROMBANKSIZE',
+                    'rom.end':          'PPROMEND',
+                    'chr.bank':         'PPCHRBANK',
+                    'chr.banksize':     'PPCHRBANKSIZE',
+                    'chr.link':         'PPCHRLINK',
+                    'chr.end':          'PPCHREND',
+                    'setpad':           'PPSETPAD',
+                    'align':            'PPALIGN' })
 
     def __init__(self):
         super(Lexer, self).__init__()
@@ -54,29 +54,26 @@ class PPLexer(Ricoh2A0XPPLexer):
                'PPSETPAD',
                'PPALIGN' ]
 
-    t_PPINESMAPPER      = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*mapper'
-    t_PPINESMIRRORING   = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*mirroring'
-    t_PPINESFOURSCREEN  = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*fourscreen'
-    t_PPINESBATTERY     = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*battery'
-    t_PPINESTRAINER     = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*trainer'
-    t_PPINESPRGREPEAT   = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*prgrepeat'
-    t_PPINESCHRREPEAT   = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*chrrepeat'
-    t_PPINESOFF         = r'\#(?i)[\t ]*ines[\t ]*\.[\t ]*off'
-
-    t_PPRAMORG          = r'\#(?i)[\t ]*ram[\t ]*\.[\t ]*org'
-    t_PPRAMEND          = r'\#(?i)[\t ]*ram[\t ]*\.[\t ]*end'
-
-    t_PPROMORG          = r'\#(?i)[\t ]*rom[\t ]*\.[\t ]*org'
-    t_PPROMBANK         = r'\#(?i)[\t ]*rom[\t ]*\.[\t ]*bank'
-    t_PPROMBANKSIZE     = r'\#(?i)[\t ]*rom[\t ]*\.[\t ]*banksize'
-    t_PPROMEND          = r'\#(?i)[\t ]*rom[\t ]*\.[\t ]*end'
-
-    t_PPCHRBANK         = r'\#(?i)[\t ]*chr[\t ]*\.[\t ]*bank'
-    t_PPCHRBANKSIZE     = r'\#(?i)[\t ]*chr[\t ]*\.[\t ]*banksize'
-    t_PPCHRLINK         = r'\#(?i)[\t ]*chr[\t ]*\.[\t ]*link'
-    t_PPCHREND          = r'\#(?i)[\t ]*chr[\t ]*\.[\t ]*end'
-
-    t_PPSETPAD          = r'\#(?i)[\t ]*setpad'
-    t_PPALIGN           = r'\#(?i)[\t ]*align'
+    directives = Ricoh2A0XPPLexer.extend_directives({
+                    'ines.mapper':      'PPINESMAPPER',
+                    'ines.mirroring':   'PPINESMIRRORING',
+                    'ines.fourscreen':  'PPINESFOURSCREEN',
+                    'ines.battery':     'PPINESBATTERY',
+                    'ines.trainer':     'PPINESTRAINER',
+                    'ines.prgrepeat':   'PPINESPRGREPEAT',
+                    'ines.chrrepeat':   'PPINESCHRREPEAT',
+                    'ines.off':         'PPINESOFF',
+                    'ram.org':          'PPRAMORG',
+                    'ram.end':          'PPRAMEND',
+                    'rom.org':          'PPROMORG',
+                    'rom.bank':         'PPROMBANK',
+                    'rom.banksize':     'PPROMBANKSIZE',
+                    'rom.end':          'PPROMEND',
+                    'chr.bank':         'PPCHRBANK',
+                    'chr.banksize':     'PPCHRBANKSIZE',
+                    'chr.link':         'PPCHRLINK',
+                    'chr.end':          'PPCHREND',
+                    'setpad':           'PPSETPAD',
+                    'align':            'PPALIGN' })
 
 
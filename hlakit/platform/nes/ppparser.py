@@ -36,7 +36,7 @@ class PPParser(Ricoh2A0XPPParser):
         super(PPParser, self).__init__(tokens)
 
     def _clean_value(self, val):
-        v = val
+        v = getattr(val, 'value', val)
 
         # macro replacements cause values to be lists of tokens
         if isinstance(v, list):
@@ -70,7 +70,10 @@ class PPParser(Ricoh2A0XPPParser):
         '''nes_pp_value : id
                         | number
                         | STRING'''
-        p[0] = p[1]
+        if p.slice[1].type == 'STRING':
+            p[0] = self._token(p, 1)
+        else:
+            p[0] = p[1]
 
     def p_nes_pp_mem_statement(self, p):
         '''nes_pp_mem_statement : PPRAMEND NL
@@ -94,8 +97,10 @@ class PPParser(Ricoh2A0XPPParser):
         for i in xrange(1, len(p)):
             if isinstance(p[i], list):
                 output += p[i]
-            else:
+            elif p.slice[i].type in ('nes_pp_value', 'filename'):
                 output.append(p[i])
+            else:
+                output.append(self._token(p, i))
         p[0] = output
 
     def p_nes_pp_ines_statement(self, p):
@@ -116,6 +121,7 @@ class PPParser(Ricoh2A0XPPParser):
 
         # store the ines setting in the target
         Session().get_target()[p[1]] = value
+        Session().get_pp_cache().note_event( ('setting', p[1], value) )
 
     # must have a p_error rule
     def p_error(self, p):
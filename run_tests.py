@@ -35,6 +35,13 @@ import sys
 import random
 import unittest
 from tests.session import CommandLineOptionsTester
+from tests.preprocessor import PreprocessorTester
+from tests.lexer import LexerTester
+from tests.symboltable import SymbolTableTester
+from tests.typetable import TypesTester
+from tests.astnodes import AstNodesTester
+from tests.tablecache import TableCacheTester
+from tests.buffer import BufferTester
 
 def main():
     # turn off stderr output
@@ -42,6 +49,20 @@ def main():
     try:
         session_suite = unittest.TestLoader().loadTestsFromTestCase( CommandLineOptionsTester )
         unittest.TextTestRunner( verbosity=2 ).run( session_suite )
+        pp_suite = unittest.TestLoader().loadTestsFromTestCase( PreprocessorTester )
+        unittest.TextTestRunner( verbosity=2 ).run( pp_suite )
+        lexer_suite = unittest.TestLoader().loadTestsFromTestCase( LexerTester )
+        unittest.TextTestRunner( verbosity=2 ).run( lexer_suite )
+        symbol_suite = unittest.TestLoader().loadTestsFromTestCase( SymbolTableTester )
+        unittest.TextTestRunner( verbosity=2 ).run( symbol_suite )
+        types_suite = unittest.TestLoader().loadTestsFromTestCase( TypesTester )
+        unittest.TextTestRunner( verbosity=2 ).run( types_suite )
+        ast_suite = unittest.TestLoader().loadTestsFromTestCase( AstNodesTester )
+        unittest.TextTestRunner( verbosity=2 ).run( ast_suite )
+        table_suite = unittest.TestLoader().loadTestsFromTestCase( TableCacheTester )
+        unittest.TextTestRunner( verbosity=2 ).run( table_suite )
+        buffer_suite = unittest.TestLoader().loadTestsFromTestCase( BufferTester )
+        unittest.TextTestRunner( verbosity=2 ).run( buffer_suite )
     except:
         return 0
 
@@ -0,0 +1,80 @@
+"""
+HLAKit AST Node Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import pickle
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.astnodes import Node, Visitor, Binary, Unary, from_tuple, to_tuple
+from tests.testcase import SessionTestCase
+
+class AstNodesTester(SessionTestCase):
+    """
+    This class aggregates all of the tests for the AST node classes.
+    """
+    def _compile(self, *args):
+        # the tuple tree the compiler parser builds for the one file given
+        with CompileContext():
+            session = self._session('--pp-cache-size=0', '-Iinclude', *args)
+            return session.compile(session.preprocess())[0][3]
+
+    def testRoundTrip(self):
+        # whole programs come back from the nodes just as the parser built them
+        for args in (('--platform=NES', os.path.join('examples', '6502', 'nes', 'visuals.s')),
+                     ('--cpu=6502', os.path.join('tests', 'test.hla')),
+                     ('--cpu=6502', os.path.join('tests', 'variables.hla')),
+                     ('--cpu=6502', os.path.join('tests', 'cond.hla')),
+                     ('--cpu=6502', os.path.join('tests', 'complexinit.hla'))):
+            tree = self._compile(*args)
+            nodes = from_tuple(tree)
+            self.assertTrue(isinstance(nodes, Node))
+            self.assertEquals(nodes.tag, 'program')
+            self.assertEquals(to_tuple(nodes), tree)
+            self.assertEquals(pickle.loads(pickle.dumps(nodes, 2)), nodes)
+
+    def testVisitor(self):
+        class Opcodes(Visitor):
+            def __init__(self):
+                super(Opcodes, self).__init__()
+                self.opcodes = []
+            def visit_Asm(self, node):
+                self.opcodes.append(node.opcode)
+
+        visitor = Opcodes()
+        visitor.visit(from_tuple(self._compile('--cpu=6502', os.path.join('tests', 'imm.hla'))))
+        self.assertTrue(len(visitor.opcodes) > 0)
+
+        # the else of an if is walked too
+        visitor = Opcodes()
+        visitor.visit(from_tuple(('program', [ ('function', 'foo',
+            [ ('if', ('conditional_clause', 'set', None, None), [ ('asm', 'ldx', ('immediate', '1')) ],
+                     [ ('asm', 'ldy', ('immediate', ('+', ('lo', [ 'a' ]), '1'))) ]) ], False) ])))
+        self.assertEquals(visitor.opcodes, [ 'ldx', 'ldy' ])
+        self.assertEquals(from_tuple(('-', '1', '2')), Binary('-', '1', '2'))
+        self.assertEquals(from_tuple(('-', '1')).kind, Unary.kind)
+
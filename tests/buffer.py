@@ -0,0 +1,70 @@
+"""
+HLAKit Buffer Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import unittest
+from cStringIO import StringIO
+from hlakit.common.buffer import Buffer
+
+class BufferTester(unittest.TestCase):
+    """
+    This class aggregates all of the tests for the binary data buffers.
+    """
+    def _data(self, buf):
+        out = StringIO()
+        buf.save(out)
+        return out.getvalue()
+
+    def testReserve(self):
+        buf = Buffer(padding=0xff)
+        buf.reserve(4)
+        self.assertEquals(self._data(buf), '\xff\xff\xff\xff')
+
+    def testAppendAfterReserve(self):
+        buf = Buffer(padding=0xff)
+        buf.reserve(4)
+        self.assertEquals(buf.append_bytes([1, 2, 3]), 3)
+        self.assertEquals(self._data(buf), '\x01\x02\x03\xff')
+
+    def testReserveShrink(self):
+        # reserving less than the buffer holds leaves it alone
+        buf = Buffer(padding=0xff)
+        buf.append_bytes([1, 2, 3])
+        buf.reserve(2)
+        self.assertEquals(self._data(buf), '\x01\x02\x03')
+
+    def testAppendTwice(self):
+        buf = Buffer()
+        buf.append_bytes([1, 2])
+        buf.append_bytes([3, 4])
+        self.assertEquals(self._data(buf), '\x01\x02\x03\x04')
+
+    def testReservePastMaxsize(self):
+        buf = Buffer(maxsize=4)
+        self.assertRaises(IndexError, buf.reserve, 5)
+
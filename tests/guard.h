@@ -0,0 +1,8 @@
+// guarded header
+#ifndef _GUARD_H
+#define _GUARD_H
+#ifdef FOO
+byte foo
+#endif
+byte guard
+#endif
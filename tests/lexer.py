@@ -0,0 +1,85 @@
+"""
+HLAKit Lexer Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import ply.lex as lex
+from hlakit.common.types import Types
+from hlakit.common.basetype import BaseType
+from tests.testcase import SessionTestCase
+
+class LexerTester(SessionTestCase):
+    """
+    This class aggregates all of the tests for the lexers.
+    """
+    def testIdClassifier(self):
+        session = self._session()
+        module = session.get_target().lexer()
+        def classify(value):
+            t = lex.LexToken()
+            t.value = value
+            t = module.t_ID(t)
+            return (t.type, t.value)
+        self.assertEquals(classify('LdA'), ('LDA', 'lda'))
+        self.assertEquals(classify('Carry'), ('CARRY', 'carry'))
+        self.assertEquals(classify('while'), ('WHILE', 'while'))
+        self.assertEquals(classify('While'), ('ID', 'While'))
+        self.assertEquals(classify('byte'), ('TYPE', 'byte'))
+
+        # typedefs are picked up as they come and go
+        snapshot = Types().snapshot()
+        self.assertEquals(classify('tile'), ('ID', 'tile'))
+        Types().new_type('tile', BaseType('tile'))
+        Types().new_type('lda', BaseType('lda'))
+        self.assertEquals(classify('tile'), ('TYPE', 'tile'))
+        self.assertEquals(classify('lda'), ('LDA', 'lda'))
+        Types().restore(snapshot)
+        self.assertEquals(classify('tile'), ('ID', 'tile'))
+
+    def testDirectives(self):
+        session = self._session()
+        lexer = session.pp_lexer()
+        def lex_all(data):
+            lexer.input(data)
+            return [ (t.type, t.value) for t in iter(lexer.token, None) ]
+
+        # directives match in any capitalization and spacing
+        self.assertEquals(lex_all('# IfDef FOO\n'),
+                          [ ('PPIFDEF', '# IfDef'), ('ID', 'FOO'), ('NL', '\n') ])
+        self.assertEquals(lex_all('#Interrupt . Start main'),
+                          [ ('PPINTSTART', '#Interrupt . Start'), ('ID', 'main') ])
+
+        # function-like macros take the name and the '('
+        self.assertEquals(lex_all('#define F(x) x'),
+                          [ ('PPDEFINEF', '#define F('), ('ID', 'x'), (')', ')'), ('ID', 'x') ])
+        self.assertEquals(lex_all('#define F (x)')[0], ('PPDEFINE', '#define'))
+
+        # anything else is a hash and the name is lexed on its own
+        self.assertEquals(lex_all('#ines.mapper'),
+                          [ ('HASH', '#'), ('ID', 'ines'), ('.', '.'), ('ID', 'mapper') ])
+        self.assertEquals(lex_all('#0x1F'), [ ('HASH', '#'), ('HEXC', '0x1F') ])
+
@@ -0,0 +1,457 @@
+"""
+HLAKit
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import pickle
+from cStringIO import StringIO
+from hlakit.common.symboltable import SymbolTable
+from hlakit.common.types import Types
+from hlakit.common.ppmacro import PPMacro
+from hlakit.common.ppskip import PPSkipper
+from hlakit.common.includeguard import IncludeGuards
+from hlakit.common.includeresolver import IncludeResolver
+from hlakit.common.buffer import Buffer
+from hlakit.common.linetable import LineTable
+from tests.testcase import SessionTestCase
+
+class PreprocessorTester(SessionTestCase):
+    """
+    This class aggregates all of the tests for the preprocessor.
+    """
+    def _tokens(self, session, f):
+        return session.preprocess_file(os.path.join('tests', f))[1]
+
+    def _values(self, tokens, newlines=False):
+        # the text of the tokens, the newlines are left out unless asked for
+        return [ getattr(t, 'value', t) for t in tokens
+                 if newlines or (getattr(t, 'type', None) != 'NL') ]
+
+    def testIncludeReusesParser(self):
+        session = self._session()
+        self._tokens(session, 'include.hla')
+        parser = session.get_pp_parser()
+        self._tokens(session, 'include.hla')
+        self.assertTrue(parser is session.get_pp_parser())
+        self.assertEquals(len(session._pp_lexers), 2)
+
+    def testIncludeRestoresState(self):
+        session = self._session()
+        tokens = self._tokens(session, 'include.hla')
+        self.assertTrue('incbin' in self._values(tokens))
+        pp = session.get_target().pp_parser()
+        self.assertEquals(pp._enabled, [ True ])
+        self.assertEquals(pp._depth, 0)
+        self.assertEquals(session.get_include_depth(), 0)
+
+    def testIfdef(self):
+        session = self._session()
+        tokens = self._values(self._tokens(session, 'ifdef.hla'))
+        self.assertEquals(tokens, [ 'word', 'baz', '=', '3', 'byte', 'quz', '=', '0' ])
+
+    def testCacheHit(self):
+        session = self._session()
+        first = self._tokens(session, 'ifdef.hla')
+        second = self._tokens(session, 'ifdef.hla')
+        self.assertEquals(first, second)
+        self.assertEquals(session.get_pp_cache().hits, 1)
+
+    def testCacheMacroState(self):
+        session = self._session()
+        self._tokens(session, 'ifdef.hla')
+        SymbolTable().new_symbol('BAR', PPMacro('BAR', []))
+        tokens = self._values(self._tokens(session, 'ifdef.hla'))
+        self.assertEquals(tokens, [ 'char', 'bar', '=', '2' ])
+        self.assertEquals(session.get_pp_cache().hits, 0)
+
+    def testCacheReplay(self):
+        session = self._session()
+        self._tokens(session, 'define.hla')
+        SymbolTable().reset_state()
+        self._tokens(session, 'define.hla')
+        self.assertEquals(session.get_pp_cache().hits, 1)
+        self.assertEquals(self._values(SymbolTable().lookup_symbol('A').value), [ '1' ])
+        self.assertEquals(SymbolTable().lookup_symbol('FOO'), None)
+
+    def testCacheDisk(self):
+        cache_dir = os.path.join(self.table_dir, 'pp')
+        session = self._session('--pp-cache-dir=%s' % cache_dir)
+        self._tokens(session, 'ifdef.hla')
+        Types.reset()
+        session = self._session('--pp-cache-dir=%s' % cache_dir)
+        self._tokens(session, 'ifdef.hla')
+        self.assertEquals(session.get_pp_cache().hits, 1)
+
+    def testCacheDiskTarget(self):
+        # the disk tier is shared, another target must not get this one's output
+        cache_dir = os.path.join(self.table_dir, 'pp')
+        path = self._write('mapper.h', '#ines.mapper "NROM"\nbyte a\n')
+        expected = {}
+        for (target, cache) in (('--platform=NES', cache_dir), ('--cpu=6502', cache_dir), ('--cpu=6502', None)):
+            SymbolTable().reset_state()
+            Types.reset()
+            args = [ target ]
+            if cache:
+                args.append('--pp-cache-dir=%s' % cache)
+            session = self._session(*args)
+            tokens = self._values(session.preprocess_file(path)[1], True)
+            self.assertEquals(session.get_pp_cache().hits, 0)
+            expected[cache] = tokens
+        self.assertEquals(expected[cache_dir], expected[None])
+        self.assertEquals(expected[None], [ '#', 'ines', '.', 'mapper', '"NROM"', '\n', 'byte', 'a', '\n' ])
+
+    def testCacheDiskIncludeDirs(self):
+        # a different search path can pick a different header
+        cache_dir = os.path.join(self.table_dir, 'pp')
+        for name in ('a', 'b'):
+            os.mkdir(os.path.join(self.table_dir, name))
+            self._write(os.path.join(name, 'which.h'), 'byte %s\n' % name)
+        path = self._write('which.hla', '#include <which.h>\n')
+        for name in ('a', 'b'):
+            SymbolTable().reset_state()
+            Types.reset()
+            session = self._session('--pp-cache-dir=%s' % cache_dir,
+                                    '-I%s' % os.path.join(self.table_dir, name))
+            self.assertEquals(self._values(session.preprocess_file(path)[1]), [ 'byte', name ])
+            self.assertEquals(session.get_pp_cache().hits, 0)
+
+    def _precompile(self, header):
+        pch = os.path.join(self.table_dir, 'test.hpch')
+        session = self._session('--precompile', '-o', pch, header)
+        session.go()
+        SymbolTable().reset_state()
+        Types.reset()
+        return pch
+
+    def testPrecompiledHeader(self):
+        header = os.path.join('tests', 'include.hla')
+        pch = self._precompile(header)
+        session = self._session('--pch=%s' % pch, '--pp-cache-size=0')
+        tokens = session.preprocess_file(header)[1]
+        self.assertEquals(session.get_pp_cache().hits, 1)
+        self.assertTrue('incbin' in self._values(tokens))
+
+    def testPrecompileRecordsOnce(self):
+        # the header is recorded by preprocess_file and nowhere else
+        header = os.path.abspath(os.path.join('tests', 'include.hla'))
+        pch = os.path.join(self.table_dir, 'test.hpch')
+        session = self._session('--precompile', '-o', pch, header)
+        session.go()
+        cache = session.get_pp_cache()
+        self.assertEquals(len(cache._entries[(header, cache.digest(header))]), 1)
+        self.assertTrue(os.path.exists(pch))
+
+    def testPrecompiledHeaderStale(self):
+        header = self._write('stale.h', '#define STALE 1\n')
+        pch = self._precompile(header)
+
+        self._write('stale.h', '#define STALE 22\n')
+        session = self._session('--pch=%s' % pch, '--pp-cache-size=0')
+        session.preprocess_file(header)
+        self.assertEquals(session.get_pp_cache().hits, 0)
+        self.assertEquals(self._values(SymbolTable().lookup_symbol('STALE').value), [ '22' ])
+
+    def testIncludeGuardDetect(self):
+        guards = IncludeGuards()
+        self.assertEquals(guards.detect('/* x */\n#ifndef A\n#define A\n#ifdef B\n#endif\n#endif\n'), 'A')
+        self.assertEquals(guards.detect('#ifndef A\n#define A\n#endif\nbyte a\n'), None)
+        self.assertEquals(guards.detect('#ifndef A\n#else\n#endif\n'), None)
+        self.assertEquals(guards.detect('byte a\n#ifndef A\n#endif\n'), None)
+
+    def testIncludeGuardElided(self):
+        session = self._session('--pp-cache-size=0')
+        tokens = self._values(self._tokens(session, 'guard.hla'))
+        self.assertEquals(tokens, [ 'byte', 'guard' ])
+        self.assertEquals(session.get_include_guards().elided, 1)
+
+    def testIncludeResolver(self):
+        resolver = IncludeResolver([ self.table_dir ])
+        self.assertEquals(resolver.resolve('foo.h', 'tests'), os.path.abspath('tests/foo.h'))
+        self.assertEquals(resolver.resolve('new.h', 'tests', True), None)
+
+        # negative lookups are cached until the directory changes
+        path = self._write('new.h', '')
+        self.assertEquals(resolver.resolve('new.h', 'tests', True), None)
+        resolver.refresh()
+        self.assertEquals(resolver.resolve('new.h', 'tests', True), path)
+
+    def testMacroValueNotShared(self):
+        # the in-place list building must not grow the macro's own value
+        session = self._session('--pp-cache-size=0')
+        path = self._write('macro.hla', '#define A 1\nbyte x = A A 2\n')
+        tokens = session.preprocess_file(path)[1]
+        self.assertEquals(self._values(tokens, True), [ 'byte', 'x', '=', '1', '1', '2', '\n' ])
+        self.assertEquals(self._values(SymbolTable().lookup_symbol('A').value), [ '1' ])
+
+    def testTokenPositions(self):
+        session = self._session('--pp-cache-size=0')
+        tokens = self._tokens(session, 'ifdef.hla')
+        baz = tokens[self._values(tokens, True).index('baz')]
+        self.assertEquals(baz.type, 'ID')
+        self.assertEquals(os.path.basename(baz.fname), 'ifdef.hla')
+        self.assertTrue(baz.lineno > 1)
+
+    def testIncludeChain(self):
+        inner = self._write('inner.h', 'byte inner\n')
+        outer = self._write('outer.hla', 'byte a\n\n#include "inner.h"\nbyte b\n')
+        for stream in (False, True):
+            SymbolTable().reset_state()
+            Types.reset()
+            session = self._session('--pp-cache-size=0')
+            if stream:
+                tokens = list(session.preprocess_stream(outer))
+            else:
+                tokens = session.preprocess_file(outer)[1]
+            table = LineTable()
+            tok = tokens[self._values(tokens, True).index('inner')]
+            self.assertEquals(table.get_include_chain(tok.pos), [ (inner, 1), (outer, 3) ])
+            self.assertEquals(table.describe(tok.pos), '%s:1, included from %s:3' % (inner, outer))
+            tok = tokens[self._values(tokens, True).index('b')]
+            self.assertEquals((tok.fname, tok.lineno), (outer, 4))
+
+        # a pickled token takes its file and line with it
+        copy = pickle.loads(pickle.dumps(tok, 2))
+        self.assertEquals((copy.value, copy.type, copy.fname, copy.lineno), ('b', 'ID', outer, 4))
+
+    def testDirectTokens(self):
+        # both paths into the compiler must give the same parse
+        f = os.path.join('tests', 'struct.hla')
+        text = self._session('--pp-cache-size=0', f)
+        expected = text.compile(text.preprocess())[0][3]
+        SymbolTable().reset_state()
+        Types.reset()
+        direct = self._session('--pp-cache-size=0', '--direct-tokens', f)
+        cunits = direct.preprocess()
+        self.assertEquals(cunits[0][2], None)
+        self.assertEquals(direct.compile(cunits)[0][3], expected)
+
+    def _stream(self, session, f):
+        return list(session.preprocess_stream(os.path.join('tests', f)))
+
+    def testStreamMatches(self):
+        for f in ('ifdef.hla', 'include.hla', 'cond.hla', 'guard.hla'):
+            expected = self._tokens(self._session('--pp-cache-size=0'), f)
+            Types.reset()
+            SymbolTable().reset_state()
+            tokens = self._stream(self._session('--pp-cache-size=0'), f)
+            self.assertEquals(self._values(tokens, True), self._values(expected, True))
+            self.assertEquals([ t.type for t in tokens ], [ t.type for t in expected ])
+            Types.reset()
+            SymbolTable().reset_state()
+
+    def testStreamIncludeOrder(self):
+        # macros from an include are seen by the lines after it
+        session = self._session('--pp-cache-size=0')
+        self._write('defs.h', '#define A 1\n')
+        path = self._write('stream.hla', '#ifndef B\n#include "defs.h"\n#ifdef A\nbyte x = A\n#endif\n#endif\n')
+        tokens = list(session.preprocess_stream(path))
+        self.assertEquals(self._values(tokens, True), [ 'byte', 'x', '=', '1', '\n' ])
+        self.assertEquals(session.get_include_depth(), 0)
+
+    def _expand(self, text):
+        session = self._session('--pp-cache-size=0')
+        path = self._write('expand.hla', text)
+        return self._values(session.preprocess_file(path)[1])
+
+    def testMacroFunction(self):
+        tokens = self._expand('#define ADD(a, b) lda a clc adc b\nADD(foo, (1, 2))\n')
+        self.assertEquals(tokens, [ 'lda', 'foo', 'clc', 'adc', '(', '1', ',', '2', ')' ])
+        macro = PPMacro.lookup('ADD')
+        self.assertEquals(macro.patches, [ (1, 0), (4, 1) ])
+
+    def testMacroNotCalled(self):
+        # without a '(' after the name a function-like macro stays put, and
+        # a space before the '(' in the #define makes it object-like
+        tokens = self._expand('#define F() nop\n#define P (1)\nF P\n')
+        self.assertEquals(tokens, [ 'F', '(', '1', ')' ])
+
+    def testMacroVariadic(self):
+        tokens = self._expand('#define V(a, ...) a __VA_ARGS__\nV(1, 2, 3)\nV(4)\n')
+        self.assertEquals(tokens, [ '1', '2', ',', '3', '4' ])
+
+    def testMacroRescan(self):
+        tokens = self._expand('#define A B\n#define B 1\n#define X X + A\nX\n')
+        self.assertEquals(tokens, [ 'X', '+', '1' ])
+
+    def testMacroHideSet(self):
+        tokens = self._expand('#define f(x) g(x)\n#define g(x) f(x)\nf(1)\n')
+        self.assertEquals(tokens, [ 'f', '(', '1', ')' ])
+
+    def testMacroTable(self):
+        session = self._session('--pp-cache-size=0')
+        table = session.get_macro_table()
+        SymbolTable().new_symbol('A', PPMacro('A', [ 'B' ]))
+        SymbolTable().new_symbol('C', PPMacro('C', [ '3' ]))
+        (deps, macro, expansion) = table.lookup('A')
+        self.assertEquals([ v[1] for v in expansion ], [ 'B' ])
+        table.lookup('A')
+        table.lookup('C')
+        self.assertEquals((table.hits, table.misses), (1, 2))
+
+        # defining B invalidates A, which expands through it, but not C
+        SymbolTable().new_symbol('B', PPMacro('B', [ '2' ]))
+        (deps, macro, expansion) = table.lookup('A')
+        self.assertEquals([ v[1] for v in expansion ], [ '2' ])
+        table.lookup('C')
+        self.assertEquals((table.hits, table.misses), (2, 3))
+
+        SymbolTable().del_symbol('A')
+        self.assertEquals(table.lookup('A')[1], None)
+
+    def testDisabledBlockSkipped(self):
+        # nothing in a disabled block is lexed, parsed or defined
+        text = '#ifdef NOPE\n#define Y 1\n@ `\n/*\n#endif\n*/\n#ifndef Z\n#else\n#endif\n' \
+               '#else\nbyte x\n#ifdef Y\nbyte y\n#endif\n#endif\nbyte z\n'
+        path = self._write('skip.hla', text)
+        for stream in (False, True):
+            SymbolTable().reset_state()
+            Types.reset()
+            session = self._session('--pp-cache-size=0')
+            if stream:
+                tokens = list(session.preprocess_stream(path))
+            else:
+                tokens = session.preprocess_file(path)[1]
+            self.assertEquals(self._values(tokens), [ 'byte', 'x', 'byte', 'z' ])
+            self.assertEquals([ t.lineno for t in tokens if t.value == 'z' ], [ 16 ])
+            self.assertEquals(PPMacro.lookup('Y'), None)
+
+    def testDisabledBlockNames(self):
+        # a directive is only one when its whole name is, just like the lexer
+        text = '#ifdef NOPE\n#ifdefined\n#endif\nbyte b\n'
+        self.assertEquals(text[PPSkipper.skip(text, 12):], '#endif\nbyte b\n')
+        text = '#ifdef NOPE\n#endifx\n#Else.x\nbyte a\n#endif\nbyte b\n'
+        self.assertEquals(text[PPSkipper.skip(text, 12):], '#endif\nbyte b\n')
+
+        path = self._write('names.hla', text)
+        for stream in (False, True):
+            SymbolTable().reset_state()
+            Types.reset()
+            session = self._session('--pp-cache-size=0')
+            if stream:
+                tokens = list(session.preprocess_stream(path))
+            else:
+                tokens = session.preprocess_file(path)[1]
+            self.assertEquals(self._values(tokens), [ 'byte', 'b' ])
+
+    def _depfile(self, *args):
+        dep = os.path.join(self.table_dir, 'include.d')
+        session = self._session('-MD', '-MF', dep, '-MT', 'include.o', *args)
+        session.preprocess_file(os.path.join('tests', 'include.hla'))
+        session.write_dependencies()
+        fin = open(dep, 'r')
+        text = fin.read()
+        fin.close()
+        return text
+
+    def testDepFile(self):
+        lines = self._depfile().splitlines()
+        self.assertEquals(lines[0], 'include.o: \\')
+        deps = [ os.path.basename(l.strip(' \\')) for l in lines[1:] ]
+        self.assertEquals(deps, [ 'include.hla', 'foo.h', 'bar.h', 'blob.bin' ])
+
+    def testDepFilePhony(self):
+        text = self._depfile('-MP')
+        self.assertTrue('\ntests/blob.bin:\n' in text)
+        self.assertFalse('\ntests/include.hla:\n' in text)
+
+    def testDepFileMissingIncBin(self):
+        # a binary that isn't found is an error, not a dependency
+        path = self._write('missing.hla', '#incbin "missing.bin"\n')
+        session = self._session('-MD', '--pp-cache-size=0')
+        self.assertRaises(IOError, session.preprocess_file, path)
+        self.assertEquals(session.get_depfile().get_paths(), [ os.path.abspath(path) ])
+
+    def testCommandLineMacros(self):
+        session = self._session('-DBAR', '-DX=4', '-DF(a,b)=a+b', '-DE=', '-UX', '-UNOPE')
+        self.assertEquals(self._values(PPMacro.lookup('BAR').value), [ '1' ])
+        self.assertEquals(PPMacro.lookup('X'), None)
+        self.assertEquals(self._values(PPMacro.lookup('F').expand([ [ '2' ], [ '3' ] ])), [ '2', '+', '3' ])
+        self.assertEquals(PPMacro.lookup('E').value, None)
+        tokens = self._values(self._tokens(session, 'ifdef.hla'))
+        self.assertEquals(tokens, [ 'char', 'bar', '=', '2' ])
+
+    def testVariants(self):
+        path = self._write('variants', '# name: switches\nbar: -DBAR\n\nplain:\nnot-bar: -D BAR -UBAR\n')
+        session = self._session('--variants=%s' % path, os.path.join('tests', 'ifdef.hla'))
+        output = session.go()
+        self.assertEquals([ v[0] for v in output ], [ 'bar', 'plain', 'not-bar' ])
+        self.assertEquals([ v[1][0][3] for v in output ],
+            [ ('program', [ ('variable', 'bar', 'char', False, None, False, None, '2') ]),
+              ('program', [ ('variable', 'baz', 'word', False, None, False, None, '3'),
+                            ('variable', 'quz', 'byte', False, None, False, None, '0') ]),
+              ('program', [ ('variable', 'baz', 'word', False, None, False, None, '3'),
+                            ('variable', 'quz', 'byte', False, None, False, None, '0') ]) ])
+        # the last variant tests the same macros as the one before it
+        self.assertEquals(session.get_pp_cache().hits, 1)
+
+    def testVariantMacros(self):
+        # the command line macros are in the snapshot, a variant only adds its own
+        path = self._write('variants', 'bar: -UBAR -DBAR=2\nplain:\n')
+        session = self._session('-DBAR', '--variants=%s' % path, os.path.join('tests', 'ifdef.hla'))
+        applied = []
+        define_macros = session.define_macros
+        def record(macros):
+            applied.append(list(macros))
+            define_macros(macros)
+        session.define_macros = record
+        output = session.go()
+        self.assertEquals(applied, [ [ ('undef', 'BAR'), ('define', 'BAR=2') ], [] ])
+        self.assertEquals(output[0][1][0][3], output[1][1][0][3])
+
+    def testIncBin(self):
+        session = self._session()
+        path = os.path.join('tests', 'blob.bin')
+        blob = session.get_incbin(path)
+        self.assertTrue(blob is session.get_incbin(os.path.abspath(path)))
+        self.assertEquals(len(blob), os.path.getsize(path))
+        self.assertFalse(blob.is_mapped())
+
+        # a blob that doesn't fit is truncated without reading the rest
+        fin = open(path, 'rb')
+        data = fin.read()
+        fin.close()
+        buf = Buffer(maxsize=16, padding=0xff)
+        self.assertFalse(buf.fits(blob.size))
+        self.assertEquals(buf.append_blob(blob), 16)
+        out = StringIO()
+        buf.save(out)
+        self.assertEquals(out.getvalue(), data[:16])
+        blob.close()
+
+    def testMemberOffsets(self):
+        # the compiler turns members into offsets and works out sizeof()
+        path = self._write('layout.hla',
+            'struct v { byte x, y }\nstruct p { word hp\nstruct v pos }\nstruct p me\nstruct p all[3]\n'
+            'function main()\n{\n\tlda me.pos.y+1\n\tlda #sizeof(me.pos)\n\tlda #sizeof(all)\n'
+            '\tlda #sizeof(struct p)\n\tlda #sizeof(other)\n}\n')
+        session = self._session('--pp-cache-size=0', path)
+        body = session.compile(session.preprocess())[0][3][1][-1][2]
+        self.assertEquals([ s[2] for s in body ],
+            [ ('absolute', [ 'me', '+', '3', '+', '1' ]), ('immediate', '2'), ('immediate', '12'),
+              ('immediate', '4'), ('immediate', ('sizeof', [ 'other' ])) ])
+
@@ -29,10 +29,13 @@ or implied, of David Huseby.
 
 import os
 import sys
+import shutil
+import tempfile
+import threading
 import unittest
 from cStringIO import StringIO
 from hlakit.common.session import Session, CommandLineError
-from hlakit.common.types import Types
+from hlakit.common.compilecontext import CompileContext
 from hlakit.platform.generic import Generic
 from hlakit.cpu.mos6502 import MOS6502
 from hlakit.platform.nes import NES
@@ -45,20 +48,20 @@ class CommandLineOptionsTester(unittest.TestCase):
     def setUp(self):
         self.old_stderr = sys.stderr
         sys.stderr = open(os.devnull, 'w')
+        self.context = CompileContext().activate()
 
     def tearDown(self):
+        CompileContext.restore(self.context)
         sys.stderr.close()
         sys.stderr = self.old_stderr
 
     def testBogusCPU(self):
         session = Session()
         self.assertRaises(CommandLineError, session.parse_args, ['--cpu=blah'])
-        Types._shared_state = {}
     
     def testBogusPlatform(self):
         session = Session()
         self.assertRaises(CommandLineError, session.parse_args, ['--platform=blah'])
-        Types._shared_state = {}
    
     def testCPUA(self):
         session = Session()
@@ -66,7 +69,6 @@ class CommandLineOptionsTester(unittest.TestCase):
         session.initialize_target()
         self.assertIsInstance(session._target, NES)
         self.assertEqual(session._target._cpu, '2a03')
-        Types._shared_state = {}
 
     def testCPUB(self):
         session = Session()
@@ -74,31 +76,31 @@ class CommandLineOptionsTester(unittest.TestCase):
         session.initialize_target()
         self.assertIsInstance(session._target, NES)
         self.assertEqual(session._target._cpu, '2a07')
-        Types._shared_state = {}
 
     def testDebug(self):
         session = Session()
         session.parse_args(['--cpu=6502', '--debug'])
         self.assertTrue(session.is_debug())
-        Types._shared_state = {}
 
     def testDebugShort(self):
         session = Session()
         session.parse_args(['--cpu=6502', '-g'])
         self.assertTrue(session.is_debug())
-        Types._shared_state = {}
+
+    def testDefine(self):
+        session = Session()
+        session.parse_args(['--cpu=6502', '-DFOO', '-U', 'BAR', '--define=BAZ=1'])
+        self.assertEquals(session.get_macros(), [ ('define', 'FOO'), ('undef', 'BAR'), ('define', 'BAZ=1') ])
 
     def testDraw(self):
         session = Session()
         session.parse_args(['--cpu=6502', '--draw_graph'])
         self.assertTrue(session.is_graph())
-        Types._shared_state = {}
 
     def testDrawShort(self):
         session = Session()
         session.parse_args(['--cpu=6502', '-d'])
         self.assertTrue(session.is_graph())
-        Types._shared_state = {}
 
     def testGeneric6502Platform(self):
         session = Session()
@@ -106,26 +108,32 @@ class CommandLineOptionsTester(unittest.TestCase):
         session.initialize_target()
         self.assertIsInstance(session._target, Generic)
         self.assertEqual(session._target._cpu, '6502')
-        Types._shared_state = {}
 
     def testGenericPlatform(self):
         session = Session()
         self.assertRaises(CommandLineError, session.parse_args, ['--platform=generic'])
-        Types._shared_state = {}
 
     def testInclude(self):
         session = Session()
         session.parse_args(['--cpu=6502', '--include=tests'])
         self.assertIsInstance(session.get_include_dirs(), list)
         self.assertEquals(session.get_include_dirs(), ['tests'])
-        Types._shared_state = {}
 
     def testIncludeShort(self):
         session = Session()
         session.parse_args(['--cpu=6502', '-Itests'])
         self.assertIsInstance(session.get_include_dirs(), list)
         self.assertEquals(session.get_include_dirs(), ['tests'])
-        Types._shared_state = {}
+
+    def testJobs(self):
+        session = Session()
+        session.parse_args(['--cpu=6502', '--jobs=4'])
+        self.assertEquals(session.get_jobs(), 4)
+
+    def testJobsShort(self):
+        session = Session()
+        session.parse_args(['--cpu=6502', '-j', '4'])
+        self.assertEquals(session.get_jobs(), 4)
 
     def testMultipleFiles(self):
         session = Session()
@@ -133,17 +141,76 @@ class CommandLineOptionsTester(unittest.TestCase):
         self.assertIsInstance(session.get_args(), list)
         self.assertEquals(session.get_args()[0], 'bar.s')
         self.assertEquals(session.get_args()[1], 'foo.s')
-        Types._shared_state = {}
 
     def testNoParameters(self):
         session = Session()
         self.assertRaises(CommandLineError, session.parse_args, [])
-        Types._shared_state = {}
+
+    def testParallel(self):
+        # the same struct is defined by both units, which only works if each
+        # unit is compiled in its own context
+        old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        table_dir = tempfile.mkdtemp()
+        try:
+            session = Session()
+            f = os.path.join('tests', 'struct.hla')
+            session.parse_args(['--cpu=6502', '--table-dir=%s' % table_dir, '-j', '2', f, f])
+            session.initialize_target()
+            output = session.go()
+        finally:
+            sys.stdout = old_stdout
+            shutil.rmtree(table_dir, True)
+        self.assertEquals([ c[0] for c in output ], [ f, f ])
+        self.assertEquals(output[0][3], output[1][3])
+
+    def testThreads(self):
+        # two builds with different macros side by side in one process
+        f = os.path.join('tests', 'ifdef.hla')
+        output = {}
+        def build(name, *args):
+            table_dir = tempfile.mkdtemp()
+            try:
+                with CompileContext():
+                    session = Session()
+                    session.parse_args(['--platform=NES', '--table-dir=%s' % table_dir] + list(args) + [f])
+                    session.initialize_target()
+                    output[name] = session.go()[0][3]
+            finally:
+                shutil.rmtree(table_dir, True)
+        old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            threads = [ threading.Thread(target=build, args=('bar', '-DBAR')),
+                        threading.Thread(target=build, args=('plain',)) ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.stdout = old_stdout
+        self.assertEquals(output['bar'],
+            ('program', [ ('variable', 'bar', 'char', False, None, False, None, '2') ]))
+        self.assertEquals(output['plain'],
+            ('program', [ ('variable', 'baz', 'word', False, None, False, None, '3'),
+                          ('variable', 'quz', 'byte', False, None, False, None, '0') ]))
+        # neither build touched the context of this thread
+        self.assertEquals(Session().get_args(), [])
+
+    def testRebuildTables(self):
+        session = Session()
+        session.parse_args(['--cpu=6502', '--rebuild-tables'])
+        self.assertTrue(session.is_rebuild_tables())
+
+    def testTableDir(self):
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=tables'])
+        session.initialize_target()
+        self.assertEquals(session.get_table_cache().get_dir(), os.path.join('tables', 'Generic_6502'))
 
     def testSingleFile(self):
         session = Session()
         session.parse_args(['--cpu=6502', 'foo.s'])
         self.assertIsInstance(session.get_args(), list)
         self.assertEquals(session.get_args()[0], 'foo.s')
-        Types._shared_state = {}
 
@@ -0,0 +1,111 @@
+"""
+HLAKit Symbol Table Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import unittest
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.symboltable import SymbolTable
+
+class SymbolTableTester(unittest.TestCase):
+    """
+    This class aggregates all of the tests for the symbol table.
+    """
+    def setUp(self):
+        self.context = CompileContext().activate()
+
+    def tearDown(self):
+        CompileContext.restore(self.context)
+
+    def testScopes(self):
+        st = SymbolTable()
+        st.new_symbol('a', 1)
+        st.scope_push('f')
+        st.new_symbol('b', 2)
+        st.scope_push()
+        st.new_symbol('a', 3)
+        self.assertEquals(st.current_namespace(), '__global__.f.__anonymous__')
+        self.assertEquals((st.lookup_symbol('a'), st.lookup_symbol('b')), (3, 2))
+        self.assertEquals(st.lookup_symbol('a', '__global__.f'), 1)
+        self.assertEquals(st.lookup_symbol('a', '__global__.f.g.h'), 1)
+
+        # a snapshot keeps the scope it was taken in
+        snapshot = st.snapshot()
+        st.scope_pop()
+        st.scope_pop()
+        st.del_symbol('a')
+        self.assertEquals((st.lookup_symbol('a'), st.lookup_symbol('b')), (None, None))
+
+        # going back into a namespace finds the symbols it had
+        st.scope_push('f')
+        self.assertEquals(st.lookup_symbol('b'), 2)
+        st.restore(snapshot)
+        self.assertEquals(st.current_namespace(), '__global__.f.__anonymous__')
+        self.assertEquals(st.lookup_symbol('a', '__global__'), 1)
+        self.assertEquals(sorted(st.get_scopes().keys()),
+                          [ '__global__', '__global__.f', '__global__.f.__anonymous__' ])
+
+        # changes after a snapshot copy only the scopes they change, and the
+        # same snapshot can be restored again
+        before = st.get_scopes()
+        snapshot = st.snapshot()
+        st.new_symbol('d', 5, '__global__.g')
+        after = st.get_scopes()
+        self.assertTrue(after['__global__.f'] is before['__global__.f'])
+        self.assertFalse(after['__global__'] is before['__global__'])
+        st.new_symbol('c', 4)
+        st.restore(snapshot)
+        self.assertEquals((st.lookup_symbol('c'), st.lookup_symbol('d', '__global__.g')), (None, None))
+        st.new_symbol('c', 6)
+        st.restore(snapshot)
+        self.assertEquals((st.lookup_symbol('c'), st.lookup_symbol('a')), (None, 3))
+
+    def testSnapshotUnchanged(self):
+        # nothing done after a snapshot shows up in it
+        st = SymbolTable()
+        st.new_symbol('a', 1)
+        st.scope_push('f')
+        st.new_symbol('b', 2)
+        snapshot = st.snapshot()
+
+        st.new_symbol('b', 3)
+        st.new_symbol('c', 4)
+        st.del_symbol('a', '__global__')
+        st.scope_push('g')
+        st.new_symbol('d', 5)
+        st.restore(snapshot)
+        self.assertEquals(st.current_namespace(), '__global__.f')
+        self.assertEquals([ st.lookup_symbol(n) for n in ('a', 'b', 'c') ], [ 1, 2, None ])
+        self.assertEquals(sorted(st.get_scopes().keys()), [ '__global__', '__global__.f' ])
+
+        # nor does anything done after restoring it
+        st.new_symbol('a', 6, '__global__')
+        st.scope_pop()
+        st.restore(snapshot)
+        self.assertEquals(st.current_namespace(), '__global__.f')
+        self.assertEquals((st.lookup_symbol('a'), st.lookup_symbol('b')), (1, 2))
+
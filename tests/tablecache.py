@@ -0,0 +1,96 @@
+"""
+HLAKit Table Cache Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import unittest
+from hlakit.common.session import Session
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.tablecache import TableCache
+
+class TableCacheTester(unittest.TestCase):
+    """
+    This class aggregates all of the tests for the lexer and parser table cache.
+    """
+    def setUp(self):
+        self.old_stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        self.table_dir = tempfile.mkdtemp()
+        self.context = CompileContext().activate()
+        session = Session()
+        session.parse_args(['--cpu=6502', '--table-dir=%s' % self.table_dir])
+        session.initialize_target()
+        self.target = session.get_target()
+
+    def tearDown(self):
+        CompileContext.restore(self.context)
+        shutil.rmtree(self.table_dir, True)
+        sys.stderr.close()
+        sys.stderr = self.old_stderr
+
+    def _truncate(self, pattern):
+        # cut a cached table in half, like a run killed while writing it
+        (path,) = glob.glob(os.path.join(self.table_dir, 'Generic_6502', pattern))
+        fin = open(path, 'rb')
+        data = fin.read()
+        fin.close()
+        fout = open(path, 'wb')
+        fout.write(data[:len(data) / 2])
+        fout.close()
+        for p in glob.glob(path + 'c'):
+            os.remove(p)
+        return (path, len(data))
+
+    def _files(self):
+        return sorted(os.listdir(os.path.join(self.table_dir, 'Generic_6502')))
+
+    def testParserRebuilt(self):
+        TableCache('Generic_6502', self.table_dir).parser(self.target.parser())
+        files = self._files()
+        (path, size) = self._truncate('*Parser_*.pickle')
+
+        parser = TableCache('Generic_6502', self.table_dir).parser(self.target.parser())
+        self.assertTrue(parser is not None)
+        self.assertEquals(os.path.getsize(path), size)
+        self.assertEquals(self._files(), files)
+
+    def testLexerRebuilt(self):
+        TableCache('Generic_6502', self.table_dir).lexer(self.target.lexer())
+        files = self._files()
+        (path, size) = self._truncate('*Lexer_*.py')
+
+        lexer = TableCache('Generic_6502', self.table_dir).lexer(self.target.lexer())
+        lexer.input('lda #1')
+        self.assertEquals([ t.value for t in iter(lexer.token, None) ], [ 'lda', '#', '1' ])
+        self.assertEquals(os.path.getsize(path), size)
+        self.assertEquals(self._files(), files)
+
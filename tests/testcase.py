@@ -0,0 +1,72 @@
+"""
+HLAKit Test Case
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+from hlakit.common.session import Session
+from hlakit.common.compilecontext import CompileContext
+
+class SessionTestCase(unittest.TestCase):
+    """
+    The base class of the tests that build sessions.  Every test runs in a
+    context of its own with the output swallowed and a scratch table dir.
+    """
+    def setUp(self):
+        self.old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        self.table_dir = tempfile.mkdtemp()
+        self.context = CompileContext().activate()
+
+    def tearDown(self):
+        sys.stdout = self.old_stdout
+        shutil.rmtree(self.table_dir, True)
+        CompileContext.restore(self.context)
+
+    def _session(self, *args):
+        # the generic 6502 target unless the args pick one
+        args = list(args)
+        if not [ a for a in args if a.startswith('--cpu') or a.startswith('--platform') ]:
+            args.insert(0, '--cpu=6502')
+        session = Session()
+        session.parse_args(['--table-dir=%s' % self.table_dir] + args)
+        session.initialize_target()
+        return session
+
+    def _write(self, name, text):
+        # a scratch file in the table dir, returns its path
+        path = os.path.join(self.table_dir, name)
+        fout = open(path, 'w')
+        fout.write(text)
+        fout.close()
+        return path
+
@@ -0,0 +1,106 @@
+"""
+HLAKit Types Tests
+Copyright (c) 2010-2011 David Huseby. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are
+permitted provided that the following conditions are met:
+
+   1. Redistributions of source code must retain the above copyright notice, this list of
+      conditions and the following disclaimer.
+
+   2. Redistributions in binary form must reproduce the above copyright notice, this list
+      of conditions and the following disclaimer in the documentation and/or other materials
+      provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY DAVID HUSEBY ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DAVID HUSEBY OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those of the
+authors and should not be interpreted as representing official policies, either expressed
+or implied, of David Huseby.
+"""
+
+import unittest
+from hlakit.common.compilecontext import CompileContext
+from hlakit.common.types import Types
+from hlakit.common.basetype import BaseType
+from hlakit.common.structtype import StructType
+from hlakit.common.arraytype import ArrayType
+
+class TypesTester(unittest.TestCase):
+    """
+    This class aggregates all of the tests for the types table.
+    """
+    def setUp(self):
+        self.context = CompileContext().activate()
+
+    def tearDown(self):
+        CompileContext.restore(self.context)
+
+    def _player(self):
+        types = Types()
+        types.new_type('byte', BaseType('byte', 1))
+        types.new_type('word', BaseType('word', 2))
+        types.new_type('struct vec', StructType('struct vec', [ ('x', 'byte'), ('y', 'byte') ]))
+        types.new_type('struct player', StructType('struct player',
+                       [ ('health', 'byte'), ('pos', 'struct vec'), ('score', 'word') ]))
+        return types
+
+    def testLayout(self):
+        types = self._player()
+        types.new_type('path', ArrayType('path', types.lookup_type('struct vec'), '$10'))
+        self.assertEquals((types.sizeof('struct player'), types.sizeof('path')), (5, 32))
+        self.assertEquals(types.member('struct player', 'pos.y'), (2, 'byte'))
+        self.assertEquals(types.member('struct player', 'pos.z'), None)
+        layout = types.layout('struct player')
+        types.new_type('unused', BaseType('unused'))
+        self.assertTrue(types.layout('struct player') is layout)
+
+    def testLayoutUnknownMember(self):
+        # a struct with a member of an unknown type has no layout yet, and
+        # that isn't remembered once the type shows up
+        types = self._player()
+        types.new_type('struct npc', StructType('struct npc', [ ('pos', 'struct vec'), ('ai', 'struct brain') ]))
+        self.assertEquals(types.layout('struct npc'), None)
+        self.assertEquals(types.sizeof('struct npc'), None)
+        self.assertFalse('struct npc' in types._layouts)
+        types.new_type('struct brain', StructType('struct brain', [ ('state', 'byte') ]))
+        self.assertEquals(types.member('struct npc', 'ai.state'), (2, 'byte'))
+
+    def testLayoutUpdate(self):
+        # updating a type lays out everything again
+        types = self._player()
+        layout = types.layout('struct player')
+        types.update_type('struct vec', StructType('struct vec', [ ('x', 'word'), ('y', 'word') ]))
+        self.assertEquals(types._layouts, {})
+        self.assertFalse(types.layout('struct player') is layout)
+        self.assertEquals(types.member('struct player', 'score'), (5, 'word'))
+        self.assertEquals(types.sizeof('struct player'), 7)
+
+    def testSnapshotUnchanged(self):
+        # nothing done after a snapshot shows up in it
+        types = Types()
+        byte = BaseType('byte', 1)
+        types.new_type('byte', byte)
+        snapshot = types.snapshot()
+
+        types.new_type('word', BaseType('word', 2))
+        types.update_type('byte', BaseType('byte', 2))
+        self.assertEquals(snapshot, { 'byte': byte })
+        types.restore(snapshot)
+        self.assertTrue(types.lookup_type('byte') is byte)
+        self.assertEquals(types.lookup_type('word'), None)
+
+        # nor does anything done after restoring it
+        types.new_type('word', BaseType('word', 2))
+        self.assertEquals(snapshot, { 'byte': byte })
+        types.restore(snapshot)
+        self.assertEquals(types.lookup_type('word'), None)
+